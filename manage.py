@@ -12,6 +12,7 @@ from tranny import create_app, app
 from tranny.extensions import db, socketio
 from tranny.models import User
 from tranny.constants import ROLE_ADMIN
+from tranny.titledb import get_title_db
 
 try:
     import __builtin__
@@ -65,6 +66,15 @@ def initdb():
     db.session.commit()
 
 
+@manager.option('-b', '--basics', dest="basics", required=True, help="title.basics.tsv(.gz) file")
+@manager.option('-r', '--ratings', dest="ratings", required=True, help="title.ratings.tsv(.gz) file")
+def import_imdb(basics, ratings):
+    """Import IMDb dataset dumps into the local title database."""
+    title_db = get_title_db()
+    count = title_db.import_dumps(basics, ratings)
+    print("Imported {0} titles into {1}".format(count, title_db.path))
+
+
 manager.add_option('-c', '--config', dest="config", required=False, help="config file")
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Release name parser benchmarks run against a large synthetic corpus of scene style
+release names. Metadata lookups are stubbed out so only local parsing cost is measured.
+
+Results are written as JSON so runs from different commits can be compared:
+
+    python tests/bench_parser.py -n 100000 -o bench_parser.json
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+import json
+import optparse
+import platform
+import random
+import subprocess
+from os.path import join, dirname
+from time import time
+from tranny.app import config
+from tranny import parser, datastore
+from tranny.service import rating
+
+words = [
+    "the", "a", "of", "and", "night", "city", "dark", "last", "house", "blue", "river", "king", "queen",
+    "road", "man", "woman", "black", "white", "fire", "ice", "ghost", "secret", "lost", "game", "life",
+    "star", "dead", "good", "wife", "home", "land", "world", "war", "love", "time", "boys", "girls",
+    "street", "hill", "valley", "doctor", "agent", "family", "empire", "kingdom", "legend", "story",
+    "shadow", "storm", "island", "north", "south", "summer", "winter", "crime", "justice", "power"
+]
+resolutions = ["", "480p", "720p", "1080p", "2160p"]
+tv_sources = ["HDTV", "WEB-DL", "WEBRip", "PDTV"]
+movie_sources = ["BluRay", "BDRip", "BRRip", "DVDRip", "WEB-DL", "HDRip"]
+codecs = ["x264", "x265", "XviD", "H.264", "HEVC"]
+groups = ["DIMENSION", "LOL", "KILLERS", "2HD", "EVOLVE", "FoV", "SPARKS", "GECKOS", "AMIABLE", "NTb", "ROVERS"]
+tags = ["PROPER", "REPACK", "INTERNAL", "LIMITED", "READNFO"]
+
+
+def make_title(rnd, low=1, high=4):
+    return ".".join(rnd.choice(words).capitalize() for _ in range(rnd.randint(low, high)))
+
+
+def make_release(rnd, shows):
+    """ Generate a single release name of a random type
+
+    :param rnd: Random generator to use
+    :type rnd: random.Random
+    :param shows: Show titles to pick tv releases from
+    :type shows: unicode[]
+    :return: Release name
+    :rtype: unicode
+    """
+    kind = rnd.random()
+    parts = []
+    if kind < 0.55:
+        # TV episode
+        parts = [rnd.choice(shows), "S{0:02d}E{1:02d}".format(rnd.randint(1, 20), rnd.randint(1, 24))]
+        source = rnd.choice(tv_sources)
+    elif kind < 0.7:
+        # Daily show
+        parts = [rnd.choice(shows), "{0}.{1:02d}.{2:02d}".format(rnd.randint(2005, 2015), rnd.randint(1, 12),
+                                                                 rnd.randint(1, 28)), make_title(rnd, 1, 2)]
+        source = rnd.choice(tv_sources)
+    elif kind < 0.8:
+        # Season pack
+        parts = [rnd.choice(shows), "S{0:02d}".format(rnd.randint(1, 20))]
+        source = rnd.choice(tv_sources)
+    else:
+        # Movie
+        parts = [make_title(rnd), "{0}".format(rnd.randint(1950, 2015))]
+        source = rnd.choice(movie_sources)
+    if rnd.random() < 0.1:
+        parts.append(rnd.choice(tags))
+    resolution = rnd.choice(resolutions)
+    if resolution:
+        parts.append(resolution)
+    parts += [source, "{0}-{1}".format(rnd.choice(codecs), rnd.choice(groups))]
+    name = ".".join(parts)
+    if rnd.random() < 0.1:
+        name = name.replace(".", " ")
+    return name
+
+
+def make_corpus(size, seed=0, show_count=1500):
+    """ Generate a reproducible corpus of release names along with the show titles
+    used to build the tv releases
+
+    :param size: Number of release names to generate
+    :type size: int
+    :param seed: Random seed
+    :type seed: int
+    :param show_count: Number of distinct shows to use
+    :type show_count: int
+    :return: release names, show titles
+    :rtype: unicode[], unicode[]
+    """
+    rnd = random.Random(seed)
+    shows = list(set(make_title(rnd, 2, 4) for _ in range(show_count)))
+    return [make_release(rnd, shows) for _ in range(size)], shows
+
+
+def setup_config(shows, ignore_count=300):
+    """ Load the test config and define a large tv filter list and ignore rule set
+
+    :param shows: Show titles to use as the tv filters
+    :type shows: unicode[]
+    :param ignore_count: Number of string ignore rules to create
+    :type ignore_count: int
+    """
+    config.read(join(dirname(__file__), "fixtures", "test_config.ini"))
+    half = len(shows) // 2
+    config.set("section_tv", "quality_hd", ", ".join(shows[:half]))
+    config.set("section_tv", "quality_sd", ", ".join(shows[half:]))
+    rnd = random.Random(ignore_count)
+    for i in range(ignore_count):
+        config.set("ignore", "string_bench{0}".format(i), ".{0}.{1}.".format(rnd.choice(words), rnd.choice(words)))
+
+
+def stub_lookups():
+    rating.imdb_info = lambda title: None
+    rating.tmdb_info = lambda title: None
+    rating.score = lambda title, min_votes=0, precision=1: 0
+
+
+def bench(fn, names):
+    """ Time a function over every name in the corpus. The parse cache is reset first
+    so each run starts cold.
+
+    :param fn: Function to time
+    :type fn: callable
+    :param names: Release names
+    :type names: unicode[]
+    :return: Timing results
+    :rtype: dict
+    """
+    parser._token_cache.clear()
+    t0 = time()
+    for name in names:
+        fn(name)
+    elapsed = time() - t0
+    return {
+        'seconds': round(elapsed, 4),
+        'names_per_sec': int(len(names) / elapsed) if elapsed else 0
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=dirname(__file__)).strip().decode()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(size=100000, seed=0):
+    names, shows = make_corpus(size, seed)
+    setup_config(shows)
+    stub_lookups()
+    functions = [
+        ("normalize", parser.normalize),
+        ("parse_release", parser.parse_release),
+        ("parse_release_info", parser.parse_release_info),
+        ("generate_release_key", datastore.generate_release_key),
+        ("is_ignored", parser.is_ignored),
+        ("valid_tv", parser.valid_tv)
+    ]
+    results = {}
+    for fn_name, fn in functions:
+        results[fn_name] = bench(fn, names)
+        print("{0:<22} {1:>10} names/sec".format(fn_name, results[fn_name]['names_per_sec']))
+    return {
+        'timestamp': int(time()),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'corpus_size': size,
+        'seed': seed,
+        'results': results
+    }
+
+
+def main():
+    opt_parser = optparse.OptionParser(usage="%prog [options]")
+    opt_parser.add_option('-n', '--size', dest="size", type="int", default=100000,
+                          help="Number of release names to generate")
+    opt_parser.add_option('-s', '--seed', dest="seed", type="int", default=0, help="Corpus random seed")
+    opt_parser.add_option('-o', '--outfile', dest="outfile", default="bench_parser.json",
+                          help="Output file for the JSON results")
+    options, args = opt_parser.parse_args()
+    results = run(options.size, options.seed)
+    with open(options.outfile, "w") as out_file:
+        json.dump(results, out_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,5 +11,12 @@ class ConfigTest(TestCase):
         sections = config.find_sections("test_")
         self.assertEqual(["test_1", "test_2"], sections)
 
+    def test_revision(self):
+        config = Configuration()
+        revision = config.revision
+        config.add_section("test_1")
+        config.set("test_1", "key", "value")
+        self.assertEqual(revision + 2, config.revision)
+
 if __name__ == '__main__':
     main()
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 from unittest import TestCase, main
-from tranny import datastore
+from flask import Flask
+from sqlalchemy import event
+from tranny import app, datastore, models, stats
+from tranny.extensions import db
 
 
 class DBTest(TestCase):
@@ -16,6 +19,79 @@ class DBTest(TestCase):
         for expected, release_name in args:
             self.assertEqual(expected, datastore.generate_release_key(release_name))
 
+    def test_release_key_format(self):
+        # Keys already stored in the downloads table must keep matching
+        args = [
+            ["hill-1978_10_00", "Hill.1978.1080p.BluRay.x264-XX"],
+            ["show.name", "Show.Name.S01E01E02.720p.HDTV.x264-GRP"],
+            ["show.name-1_1", "Show.Name.S01E01-GRP"],
+            ["the.daily.show.-.tom.cruise-2013_04_16", "The Daily Show - Tom Cruise 2013-04-16 [HDTV - 2HD]"],
+            [False, "No.Marker.Here.HDTV"]
+        ]
+        for expected, release_name in args:
+            self.assertEqual(expected, datastore.generate_release_key(release_name), release_name)
+
+
+class DownloadHistoryTest(TestCase):
+    """ Queries against the download history, using a in memory database """
+    def setUp(self):
+        self.app = Flask("tranny_test")
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite://"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        sections = [models.Section("section_tv"), models.Section("section_movies")]
+        sources = [models.Source("eztv"), models.Source("btn"), models.Source("watch")]
+        db.session.add_all(sections + sources)
+        db.session.commit()
+        downloads = [
+            ("show-1_1", sections[0], sources[0]),
+            ("show-1_2", sections[0], sources[0]),
+            ("show-1_3", sections[0], sources[1]),
+            ("other-2_1", sections[0], sources[1]),
+            ("movie-2014", sections[1], sources[2])
+        ]
+        for release_key, section, source in downloads:
+            db.session.add(models.DownloadEntity(release_key, release_key, section.section_id, source.source_id))
+        db.session.commit()
+        self.queries = []
+        event.listen(db.engine, "before_cursor_execute", self.count_query)
+        app.config.add_section("rss_eztv_test")
+        app.config.add_section("service_btn_test")
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self.count_query)
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        app.config.remove_section("rss_eztv_test")
+        app.config.remove_section("service_btn_test")
+
+    def count_query(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append(statement)
+
+    def test_existing_release_keys(self):
+        release_keys = ["show-1_1", "show-1_4", "other-2_1", "show-1_1", "missing-1_1", "movie-2014", False, None]
+        found = datastore.existing_release_keys(release_keys, chunk_size=2)
+        self.assertEqual({"show-1_1", "other-2_1", "movie-2014"}, found)
+        # 5 distinct keys once the False values are skipped
+        self.assertEqual(3, len(self.queries))
+        self.assertEqual(set(), datastore.existing_release_keys([False, None, ""]))
+        self.assertEqual(3, len(self.queries))
+
+    def test_count_downloads(self):
+        self.assertEqual({"eztv": 2, "btn": 2, "watch": 1}, dict(datastore.count_downloads_by_source()))
+        self.assertEqual({"section_tv": 4, "section_movies": 1}, dict(datastore.count_downloads_by_section()))
+        self.assertEqual(2, len(self.queries))
+
+    def test_stats(self):
+        self.assertEqual([{'label': "tv", 'data': 4}, {'label': "movies", 'data': 1}], stats.section_totals())
+        self.assertEqual(sorted([{'label': "RSS", 'data': 2}, {'label': "btn (api)", 'data': 2},
+                                 {'label': "Watch", 'data': 1}]), sorted(stats.service_type_totals()))
+        self.assertEqual({"eztv": 2, "btn": 2, "watch": 1},
+                         {row['label']: row['data'] for row in stats.service_totals()})
+
 
 if __name__ == '__main__':
     main()
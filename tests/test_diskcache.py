@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+from tranny.diskcache import DiskCache
+
+
+class DiskCacheTest(TestCase):
+    def setUp(self):
+        self.path = mkdtemp()
+        self.db_path = join(self.path, "cache.db")
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def test_persist(self):
+        cache = DiskCache(self.db_path, ttl=60, negative_ttl=-1)
+        cache.set("movie", {'kind': "movie"})
+        cache.set("missing", None)
+        self.assertEqual({'kind': "movie"}, cache.get("movie"))
+        self.assertEqual("default", cache.get("missing", "default"))
+        cache = DiskCache(self.db_path)
+        self.assertEqual({'kind': "movie"}, cache.get("movie"))
+        self.assertEqual(1, len(cache))
+
+    def test_negative_ttl(self):
+        cache = DiskCache(self.db_path, ttl=60, negative_ttl=0)
+        cache.set("missing", {'kind': "movie"})
+        cache.set("missing", None)
+        self.assertEqual("default", cache.get("missing", "default"))
+        cache = DiskCache(self.db_path)
+        self.assertEqual(0, len(cache))
+        cache.set("missing", None)
+        self.assertIsNone(cache.get("missing", "default"))
+
+    def test_evict(self):
+        cache = DiskCache(self.db_path, max_size=10)
+        cache.set_many([("key_{0}".format(i), i) for i in range(20)])
+        self.assertTrue(len(cache) <= 10)
+        self.assertEqual(19, cache.get("key_19"))
+
+
+if __name__ == '__main__':
+    main()
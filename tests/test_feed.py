@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from io import BytesIO
+from unittest import TestCase, main
+from tranny.feed import iter_entries, ParseError
+
+rss = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+<channel>
+    <title>Example</title>
+    <item>
+        <title>Show.Name.S01E02.720p.HDTV.x264-GRP</title>
+        <link>https://example.com/download/2</link>
+        <guid>https://example.com/details/2</guid>
+    </item>
+    <item>
+        <title> Show &amp; Tell.S01E01.HDTV.x264-GRP </title>
+        <enclosure url="https://example.com/download/1" type="application/x-bittorrent"/>
+    </item>
+</channel>
+</rss>
+"""
+
+atom = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+    <title>Example</title>
+    <entry>
+        <title>Movie.Name.2014.1080p.BluRay.x264-GRP</title>
+        <id>urn:example:1</id>
+        <link rel="alternate" href="https://example.com/details/1"/>
+        <link rel="enclosure" href="https://example.com/download/1"/>
+    </entry>
+</feed>
+"""
+
+broken = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+<channel>
+    <title>Example</title>
+    <item>
+        <title>Show.Name.S01E02.720p.HDTV.x264-GRP</title>
+        <link>https://example.com/download/2</link>
+    </item>
+    <item>
+        <title>Show &amp; Tell&nbsp;S01E01 &copy; &bogus; R&D&#38;Co</title>
+        <link>https://example.com/download.php?id=1&name=show</link>
+    </item>
+</channel>
+</rss>
+"""
+
+
+class FeedTest(TestCase):
+    def test_rss(self):
+        entries = list(iter_entries(BytesIO(rss)))
+        self.assertEqual([
+            {'title': "Show.Name.S01E02.720p.HDTV.x264-GRP", 'link': "https://example.com/download/2",
+             'id': "https://example.com/details/2"},
+            {'title': "Show & Tell.S01E01.HDTV.x264-GRP", 'link': "https://example.com/download/1"}
+        ], entries)
+
+    def test_atom(self):
+        entries = list(iter_entries(BytesIO(atom)))
+        self.assertEqual([{'title': "Movie.Name.2014.1080p.BluRay.x264-GRP", 'id': "urn:example:1",
+                           'link': "https://example.com/details/1"}], entries)
+
+    def test_stop(self):
+        entries = iter_entries(BytesIO(rss))
+        self.assertEqual("https://example.com/details/2", next(entries)['id'])
+
+    def test_repair(self):
+        entries = list(iter_entries(BytesIO(broken)))
+        self.assertEqual([
+            {'title': "Show.Name.S01E02.720p.HDTV.x264-GRP", 'link': "https://example.com/download/2"},
+            {'title': "Show & Tell\u00a0S01E01 \u00a9 &bogus; R&D&Co",
+             'link': "https://example.com/download.php?id=1&name=show"}
+        ], entries)
+
+    def test_invalid(self):
+        with self.assertRaises(ParseError):
+            list(iter_entries(BytesIO(rss[:200])))
+
+
+if __name__ == '__main__':
+    main()
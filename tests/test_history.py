@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import sys
+from unittest import TestCase, main
+from tranny.history import ReleaseIndex
+
+
+class ReleaseIndexTest(TestCase):
+    def test_build(self):
+        index = ReleaseIndex()
+        self.assertFalse(index.loaded)
+        self.assertEqual(3, index.build(["first.snow-2006", "conan-2013_04_15", "game.of.kitties-3_3",
+                                         "conan-2013_04_15"]))
+        self.assertTrue(index.loaded)
+        self.assertIn("conan-2013_04_15", index)
+        self.assertIn("first.snow-2006", index)
+        self.assertNotIn("conan-2013_04_16", index)
+        self.assertEqual(3, len(index))
+
+    def test_hash_range(self):
+        # Every value hash() can return must fit in the index
+        largest = getattr(sys, "maxint", sys.maxsize)
+        index = ReleaseIndex()
+        index._hashes.extend([-largest - 1, largest])
+        self.assertEqual([-largest - 1, largest], index._hashes.tolist())
+
+    def test_add(self):
+        index = ReleaseIndex()
+        index.build(["first.snow-2006"])
+        index.add("game.of.kitties-3_3")
+        index.add("first.snow-2006")
+        self.assertIn("game.of.kitties-3_3", index)
+        self.assertEqual(2, len(index))
+        index.build(["first.snow-2006"])
+        self.assertNotIn("game.of.kitties-3_3", index)
+
+    def test_existing(self):
+        index = ReleaseIndex()
+        index.build(["first.snow-2006", "conan-2013_04_15"])
+        index.add("game.of.kitties-3_3")
+        self.assertEqual({"conan-2013_04_15", "game.of.kitties-3_3"},
+                         index.existing(["conan-2013_04_15", "game.of.kitties-3_3", "conan-2013_04_16", False]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest import TestCase, main
+from tranny import app, inflight
+from tranny.inflight import InFlightRegistry
+
+
+class InFlightRegistryTest(TestCase):
+    def test_claim(self):
+        registry = InFlightRegistry()
+        self.assertTrue(registry.claim("show.name-1_1"))
+        self.assertFalse(registry.claim("show.name-1_1"))
+        self.assertIn("show.name-1_1", registry)
+        registry.release("show.name-1_1")
+        self.assertNotIn("show.name-1_1", registry)
+        self.assertTrue(registry.claim("show.name-1_1"))
+
+    def test_claim_hash(self):
+        registry = InFlightRegistry()
+        registry.claim("show.name-1_1")
+        registry.claim("show.name.repack-1_1")
+        self.assertTrue(registry.claim_hash("show.name-1_1", "abcd"))
+        self.assertTrue(registry.claim_hash("show.name-1_1", "abcd"))
+        self.assertFalse(registry.claim_hash("show.name.repack-1_1", "abcd"))
+        registry.release("show.name-1_1")
+        self.assertTrue(registry.claim_hash("show.name.repack-1_1", "abcd"))
+
+    def test_ttl(self):
+        registry = InFlightRegistry(ttl=-1)
+        registry.claim("show.name-1_1")
+        registry.claim_hash("show.name-1_1", "abcd")
+        self.assertTrue(registry.claim("show.name-1_1"))
+        registry.claim("other-1_1")
+        self.assertTrue(registry.claim_hash("other-1_1", "abcd"))
+        self.assertEqual(2, len(registry))
+
+    def test_get_registry(self):
+        original, ttl = inflight._registry, app.config.get_default("general", "inflight_ttl", "600")
+        inflight._registry = None
+        app.config.set("general", "inflight_ttl", "30")
+        try:
+            # Created with the config loaded by the time it is first used
+            self.assertEqual(30, inflight.get_registry().ttl)
+            self.assertIs(inflight.get_registry(), inflight.get_registry())
+        finally:
+            app.config.set("general", "inflight_ttl", ttl)
+            inflight._registry = original
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import random
+from time import time
+from unittest import TestCase, main
+import gevent
+from tranny.manager import ServiceManager
+
+
+class FakeProvider(object):
+    """ Provider returning a fixed list of torrents, optionally taking a while to do so """
+    def __init__(self, name, interval=60, timeout=5, delay=0, torrents=None, cooldown=0):
+        self.name = name
+        self.config_section = "rss_{0}".format(name)
+        self.interval = interval
+        self.timeout = timeout
+        self.last_update = 0
+        self.delay = delay
+        self.torrents = torrents or []
+        self.cooldown = cooldown
+        self.polls = []
+        self.running = 0
+        self.max_running = 0
+        self.claimed = set()
+        self.released = []
+
+    def find_matches(self):
+        self.polls.append(time())
+        self.claimed.update(self.torrents)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            gevent.sleep(self.delay)
+        finally:
+            self.running -= 1
+        # Providers pause themselves by pushing last_update into the future, eg: BTN API cool down
+        self.last_update = time() + self.cooldown
+        return self.torrents
+
+    def release_claims(self):
+        self.released.extend(sorted(self.claimed))
+        self.claimed.clear()
+
+
+class TestServiceManager(ServiceManager):
+    """ Service manager without any configured providers or torrent client """
+    def __init__(self):
+        self.added = []
+        self.adding = 0
+        self.max_adding = 0
+        super(TestServiceManager, self).__init__()
+        # Tests start the scheduler themselves once their providers are set
+        self._updater.kill()
+
+    @staticmethod
+    def init_services():
+        return []
+
+    def add(self, torrent, service, dl_path=None):
+        self.adding += 1
+        self.max_adding = max(self.max_adding, self.adding)
+        gevent.sleep(0.01)
+        self.added.append((torrent, service.name))
+        self.adding -= 1
+
+    def run(self, services):
+        self.services = services
+        self._updater = gevent.spawn(self.update_providers)
+        gevent.sleep(0)
+
+
+class ServiceManagerTest(TestCase):
+    def setUp(self):
+        # No random jitter, so polls happen exactly when due
+        self.uniform = random.uniform
+        random.uniform = lambda a, b: a
+        self.manager = TestServiceManager()
+
+    def tearDown(self):
+        self.manager._updater.kill()
+        self.manager._adder.kill()
+        self.manager._poll_pool.kill()
+        random.uniform = self.uniform
+
+    def test_timeout(self):
+        slow = FakeProvider("slow", timeout=0.05, delay=2, torrents=["slow_torrent"])
+        fast = FakeProvider("fast", torrents=["fast_torrent"])
+        self.manager.run([slow, fast])
+        gevent.sleep(0.3)
+        # The slow provider is stopped without holding up the other provider
+        self.assertEqual([("fast_torrent", "fast")], self.manager.added)
+        self.assertEqual(0, slow.running)
+        self.assertNotIn(slow, self.manager._polling)
+        self.assertIn(slow, self.manager._due)
+        # The claims of the torrents fetched before the timeout are released, unlike queued ones
+        self.assertEqual(["slow_torrent"], slow.released)
+        self.assertEqual([], fast.released)
+        self.assertEqual(set(), fast.claimed)
+
+    def test_error(self):
+        broken = FakeProvider("broken")
+        broken.find_matches = lambda: 1 / 0
+        # Claimed by an earlier entry of the failed poll
+        broken.claimed.add("partial")
+        working = FakeProvider("working", torrents=["torrent"])
+        self.manager.run([broken, working])
+        gevent.sleep(0.2)
+        self.assertEqual([("torrent", "working")], self.manager.added)
+        self.assertIn(broken, self.manager._due)
+        self.assertEqual(["partial"], broken.released)
+
+    def test_not_polled_while_running(self):
+        service = FakeProvider("busy", interval=0, delay=0.5)
+        self.manager.run([service])
+        gevent.sleep(0.05)
+        for _ in range(3):
+            self.assertTrue(self.manager.poll_now(service.config_section))
+            gevent.sleep(0.01)
+        self.assertEqual(1, len(service.polls))
+        gevent.sleep(0.8)
+        self.assertEqual(1, service.max_running)
+        self.assertTrue(len(service.polls) >= 2)
+
+    def test_interval(self):
+        service = FakeProvider("interval", interval=0.2)
+        self.manager.run([service])
+        gevent.sleep(0.5)
+        # Polled at 0, 0.2 and 0.4 seconds, allowing for a late wake up
+        self.assertTrue(2 <= len(service.polls) <= 3, service.polls)
+        for previous, current in zip(service.polls, service.polls[1:]):
+            self.assertTrue(current - previous >= 0.19)
+
+    def test_cooldown(self):
+        service = FakeProvider("cooldown", interval=0.05, cooldown=0.3)
+        self.manager.run([service])
+        # Polled at 0 then not before 0.35 seconds, next poll not before 0.7 seconds
+        gevent.sleep(0.55)
+        self.assertEqual(2, len(service.polls))
+        self.assertTrue(service.polls[1] - service.polls[0] >= 0.34)
+
+    def test_stale_schedule(self):
+        service = FakeProvider("stale")
+        self.manager.run([])
+        self.manager.schedule(service, 0.05)
+        self.manager.schedule(service, 10)
+        gevent.sleep(0.2)
+        # The replaced entry is skipped and dropped from the schedule
+        self.assertEqual([], service.polls)
+        self.assertEqual(1, len(self.manager._schedule))
+        self.manager.schedule(service, 0.05)
+        gevent.sleep(0.25)
+        self.assertEqual(1, len(service.polls))
+
+    def test_poll_now(self):
+        service = FakeProvider("now", interval=10)
+        self.manager.run([])
+        self.manager.services = [service]
+        self.manager.schedule(service, 10)
+        scheduled = self.manager._due[service]
+        gevent.sleep(0.05)
+        self.assertEqual([], service.polls)
+        self.assertTrue(self.manager.poll_now(service.config_section))
+        self.assertFalse(self.manager.poll_now("rss_unknown"))
+        gevent.sleep(0.2)
+        self.assertEqual(1, len(service.polls))
+        # Rescheduled after its interval, replacing the poll scheduled before
+        self.assertNotEqual(scheduled, self.manager._due[service])
+        self.assertTrue(self.manager._due[service] >= time() + 9)
+
+    def test_process_adds(self):
+        service = FakeProvider("adds", torrents=["a", "b", "c"])
+        other = FakeProvider("other", torrents=["d", "e"])
+        self.manager.run([service, other])
+        gevent.sleep(0.3)
+        self.assertEqual(["a", "b", "c"], [torrent for torrent, name in self.manager.added if name == "adds"])
+        self.assertEqual(5, len(self.manager.added))
+        # Torrents are added one at a time
+        self.assertEqual(1, self.manager.max_adding)
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,12 @@ class NetTest(TestCase):
         status = net.download("bs_name", "http://bs.url.com/blah.torrent", "./")
         self.assertFalse(status)
 
+    def test_session(self):
+        self.assertIs(net.get_session(), net.get_session())
+        session = net.new_session()
+        self.assertIsNot(net.get_session(), session)
+        self.assertIs(net.get_session().get_adapter("https://example.com"), session.get_adapter("https://example.com"))
+
     def test_parse_net_speed_value(self):
         self.assertEqual(10752.0, net.parse_net_speed_value(u'10.5 KiB/s'))
         self.assertEqual(11010048.0, net.parse_net_speed_value(u'10.5 MiB/s'))
@@ -20,6 +20,37 @@ class ReleaseTest(TrannyTestCase):
         for expected, release_name in test_data:
             self.assertDictContainsSubset(expected, parser.parse_release_info(release_name))
 
+    def test_tokenize(self):
+        info = parser.tokenize(self.release_a)
+        self.assertEqual("The.Mentalist", info.title)
+        self.assertEqual((5, 10), (info.season, info.episode))
+        self.assertEqual(("720p", "hdtv", "x264", "DIMENSION"), (info.resolution, info.source, info.codec, info.group))
+        self.assertEqual("hd", info.quality)
+        self.assertFalse(info.proper)
+
+        info = parser.tokenize(self.release_e)
+        self.assertEqual("The.Daily.Show.-.Tom.Cruise", info.title)
+        self.assertEqual((2013, 4, 16), info.date)
+        self.assertEqual(2013, info.year)
+
+        info = parser.tokenize(self.release_d)
+        self.assertEqual(("Easy.Money", 2010), (info.title, info.year))
+        self.assertEqual("sd", info.quality)
+
+        self.assertTrue(parser.tokenize("Homeland.S02E11.PROPER.HDTV.x264-EVOLVE").proper)
+
+    def test_tokenize_episode_suffix(self):
+        test_data = [
+            [("Show.Name", 1, 1, "GRP"), "Show.Name.S01E01E02.720p.HDTV.x264-GRP"],
+            [("The.Office.US", 9, 23, "GRP"), "The.Office.US.S09E23E24.720p.HDTV.x264-GRP"],
+            [("Show", 1, 1, "GRP"), "Show.S01E01-E02.720p.HDTV.x264-GRP"],
+            [("Show.Name", 1, 1, "GRP"), "Show.Name.S01E01-GRP"],
+            [("Show", 1, 2, "ettv"), "Show.s01e02-ettv"]
+        ]
+        for expected, release_name in test_data:
+            info = parser.tokenize(release_name)
+            self.assertEqual(expected, (info.title, info.season, info.episode, info.group), release_name)
+
     def test_parse_release(self):
         test_data = [
             ["The.Mentalist", self.release_a],
@@ -42,6 +73,21 @@ class ReleaseTest(TrannyTestCase):
         for expected, release_name in test_data:
             self.assertEqual(expected, parser.match_release(release_name), release_name)
 
+    def test_match_releases(self):
+        release_names = [self.release_a, self.release_b, self.release_a.replace(".", " "), self.release_a]
+        expected = {
+            self.release_a: "section_tv",
+            self.release_b: False,
+            self.release_a.replace(".", " "): "section_tv"
+        }
+        self.assertEqual(expected, parser.match_releases(release_names))
+
+    def test_match_release_cache(self):
+        parser.match_release(self.release_a)
+        hits = parser.match_cache.hits
+        self.assertEqual("section_tv", parser.match_release(self.release_a.replace(".", " ")))
+        self.assertEqual(hits + 1, parser.match_cache.hits)
+
     def test_find_date(self):
         test_data = [
             [False, self.release_a],
@@ -67,5 +113,50 @@ class ReleaseTest(TrannyTestCase):
         ]
         self.run_data_set(test_data, parser.is_ignored)
 
+    def test_valid_tv_reload(self):
+        config = self.get_config()
+        release_name = 'Show.Under.Test.S01E02.720p.HDTV.x264-XX'
+        self.assertFalse(parser.valid_tv(release_name))
+        config.set("section_tv", "quality_any", "Show Under Test, Other Show")
+        try:
+            self.assertEqual("tv", parser.valid_tv(release_name))
+            self.assertFalse(parser.valid_tv('Show.Under.S01E02.720p.HDTV.x264-XX'))
+        finally:
+            config.remove_option("section_tv", "quality_any")
+        self.assertFalse(parser.valid_tv(release_name))
+
+    def test_is_ignored_reload(self):
+        config = self.get_config()
+        release_name = 'Homeland.S02E11.HDTV.x264-EVOLVE'
+        self.assertFalse(parser.is_ignored(release_name))
+        config.set("ignore", "string_test", "homeland.s02")
+        try:
+            self.assertTrue(parser.is_ignored(release_name))
+        finally:
+            config.remove_option("ignore", "string_test")
+        self.assertFalse(parser.is_ignored(release_name))
+
+    def test_is_ignored_rx_single(self):
+        config = self.get_config()
+        rules = [
+            ["rx_test1", r"(?P<show>homeland)\.s02e11"],
+            ["rx_test2", r"(?P<show>dexter)\.s01"],
+            ["rx_test3", r"(?P<r0>mike)\.and\.molly"],
+            ["rx_test4", r"(?x) the \. mentalist"],
+            ["rx_test5", r"the daily show"]
+        ]
+        for key, value in rules:
+            config.set("ignore", key, value)
+        try:
+            self.assertTrue(parser.is_ignored('Homeland.S02E11.HDTV.x264-EVOLVE'))
+            self.assertTrue(parser.is_ignored('Dexter.S01E02.HDTV.x264-XX'))
+            self.assertTrue(parser.is_ignored('The.Mentalist.S05E10.720p.HDTV.X264-DIMENSION'))
+            # Inline flags only apply to their own rule
+            self.assertTrue(parser.is_ignored(self.release_e))
+        finally:
+            for key, _ in rules:
+                config.remove_option("ignore", key)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from time import time
+from unittest import TestCase, main
+import gevent
+from tranny.ratelimit import RateLimiter, parse_retry_after
+
+
+class RateLimiterTest(TestCase):
+    def test_burst(self):
+        limiter = RateLimiter(10, burst=5)
+        t0 = time()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertLess(time() - t0, 0.05)
+        limiter.acquire()
+        self.assertGreater(time() - t0, 0.05)
+
+    def test_queue(self):
+        limiter = RateLimiter(50, burst=1)
+        waiters = [gevent.spawn(limiter.acquire) for _ in range(5)]
+        gevent.sleep(0)
+        self.assertEqual(4, limiter.queue_depth())
+        gevent.joinall(waiters)
+        self.assertEqual(0, limiter.queue_depth())
+
+    def test_throttled(self):
+        limiter = RateLimiter(100, burst=10)
+        limiter.throttled(0.1)
+        self.assertEqual(50, limiter.current_rate)
+        t0 = time()
+        limiter.acquire()
+        self.assertGreater(time() - t0, 0.09)
+        for _ in range(10):
+            limiter.succeeded()
+        self.assertEqual(100, limiter.current_rate)
+        self.assertEqual(1, limiter.stats()['throttled'])
+
+    def test_parse_retry_after(self):
+        self.assertEqual(3, parse_retry_after("3"))
+        self.assertIsNone(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+if __name__ == '__main__':
+    main()
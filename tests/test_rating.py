@@ -1,4 +1,5 @@
 import unittest
+import gevent
 from tests import get_fixture
 from tranny import init_config
 
@@ -22,3 +23,24 @@ class TestRating(unittest.TestCase):
     def test_score(self):
         self.assertTrue(rating.score(self.title_a) > 2.0)
 
+    def test_media_kind(self):
+        self.assertEqual("movie", rating.media_kind(self.title_a, 1994))
+        self.assertEqual("series", rating.media_kind("Homeland"))
+
+
+    def test_single_flight(self):
+        calls = []
+
+        def fetch(value):
+            calls.append(value)
+            gevent.sleep(0.01)
+            return value
+
+        lookups = [gevent.spawn(rating._single_flight, "test:key", fetch, i) for i in range(5)]
+        gevent.joinall(lookups)
+        self.assertEqual([0], calls)
+        self.assertEqual([0] * 5, [lookup.value for lookup in lookups])
+        self.assertEqual({}, rating._in_flight)
+
+    def test_lookup_key(self):
+        self.assertEqual("imdb:the mask", rating._lookup_key("imdb", "The  Mask "))
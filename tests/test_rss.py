@@ -1,6 +1,40 @@
-from unittest import main
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from contextlib import contextmanager
+from io import BytesIO
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+from gevent import Timeout
+from requests import HTTPError
+from tranny import app, net, parser, provider, datastore, inflight
+from tranny.service import rating
+from tranny.diskcache import DiskCache
+from tranny.history import ReleaseIndex
+from tranny.inflight import InFlightRegistry
+from tranny.provider import rss
+from tranny.provider.rss import RSSFeed, SeenEntries
 from testcase import TrannyTestCase
-from tranny.provider.rss import RSSFeed
+
+feed_url = "https://example.com/rss"
+
+
+def build_feed(*titles):
+    items = "".join("<item><title>{0}</title><link>https://example.com/download/{0}</link></item>".format(title)
+                    for title in titles)
+    return "<rss><channel><title>Example</title>{0}</channel></rss>".format(items).encode("utf-8")
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, body=b"", headers=None):
+        self.status_code = status_code
+        self.raw = BytesIO(body)
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError("{0} Error".format(self.status_code))
 
 
 class RSSFeedTest(TrannyTestCase):
@@ -15,5 +49,222 @@ class RSSFeedTest(TrannyTestCase):
         self.assertFalse(kat_releases)
 
 
+class RSSFeedPollTest(TestCase):
+    def setUp(self):
+        self.path = mkdtemp()
+        self.originals = [
+            (rss, "_feed_cache", rss._feed_cache),
+            (net, "open_url", net.open_url),
+            (net, "fetch_torrent", net.fetch_torrent),
+            (parser, "match_releases", parser.match_releases),
+            (rating, "media_kind", rating.media_kind),
+            (rating, "score", rating.score),
+            (inflight, "_registry", inflight._registry),
+            (provider.history, "index", provider.history.index)
+        ]
+        self.match_releases = parser.match_releases
+        rss._feed_cache = DiskCache(join(self.path, "feeds.db"), table="feeds")
+        net.open_url = self.open_url
+        net.fetch_torrent = self.fetch_torrent
+        parser.match_releases = lambda names: {name: self.sections.get(name, False) for name in names}
+        inflight._registry = InFlightRegistry()
+        provider.history.index = ReleaseIndex()
+        provider.history.index.build([])
+        app.config.add_section("rss_test")
+        app.config.set("rss_test", "url", feed_url)
+        app.config.set("rss_test", "enabled", "true")
+        self.responses = []
+        self.requests = []
+        self.downloads = []
+        self.failing = set()
+        self.sections = {}
+
+    def tearDown(self):
+        for module, name, value in self.originals:
+            setattr(module, name, value)
+        app.config.remove_section("rss_test")
+        rmtree(self.path)
+
+    @contextmanager
+    def open_url(self, url, headers=None, timeout=10):
+        self.requests.append(headers or {})
+        yield self.responses.pop(0)
+
+    def fetch_torrent(self, url, max_size=None, timeout=10):
+        self.downloads.append(url)
+        if url in self.failing:
+            return None
+        return b"torrent", url
+
+    def poll(self, feed, response):
+        self.responses.append(response)
+        return [torrent.release_name for torrent in feed.fetch_releases()]
+
+    def release(self, release_names):
+        for release_name in release_names:
+            inflight.get_registry().release(datastore.generate_release_key(release_name))
+
+    def test_not_modified(self):
+        feed = RSSFeed("rss_test")
+        headers = {'ETag': '"v1"', 'Last-Modified': "Sat, 17 Oct 2026 10:00:00 GMT"}
+        self.sections = {"Show.S01E01.HDTV.x264-GRP": "section_tv"}
+        found = self.poll(feed, FakeResponse(body=build_feed("Show.S01E01.HDTV.x264-GRP"), headers=headers))
+        self.assertEqual(["Show.S01E01.HDTV.x264-GRP"], found)
+        self.assertEqual({}, self.requests[0])
+        self.assertEqual({'etag': '"v1"', 'modified': "Sat, 17 Oct 2026 10:00:00 GMT"},
+                         rss.get_feed_cache().get(feed.feed_key("http")))
+        self.assertEqual([], self.poll(feed, FakeResponse(304)))
+        self.assertEqual({'If-None-Match': '"v1"', 'If-Modified-Since': "Sat, 17 Oct 2026 10:00:00 GMT"},
+                         self.requests[1])
+        self.assertEqual(1, len(self.downloads))
+
+    def test_last_entry(self):
+        feed = RSSFeed("rss_test")
+        self.sections = {"Show.S01E01.HDTV.x264-GRP": "section_tv", "Show.S01E02.HDTV.x264-GRP": "section_tv"}
+        self.poll(feed, FakeResponse(body=build_feed("Show.S01E01.HDTV.x264-GRP")))
+        self.assertEqual("https://example.com/download/Show.S01E01.HDTV.x264-GRP",
+                         rss.get_feed_cache().get(feed.feed_key("last")))
+        # Reading stops at the newest entry of the previous poll
+        body = build_feed("Show.S01E02.HDTV.x264-GRP", "Show.S01E01.HDTV.x264-GRP", "Show.S01E00.HDTV.x264-GRP")
+        self.assertEqual(["Show.S01E02.HDTV.x264-GRP"], self.poll(feed, FakeResponse(body=body)))
+        self.assertEqual(2, len(self.downloads))
+
+    def test_partial_failure(self):
+        feed = RSSFeed("rss_test")
+        names = ["Show.S01E02.HDTV.x264-GRP", "Show.S01E01.HDTV.x264-GRP"]
+        self.sections = dict.fromkeys(names, "section_tv")
+        self.failing = {"https://example.com/download/Show.S01E01.HDTV.x264-GRP"}
+        body = build_feed(*names)
+        found = self.poll(feed, FakeResponse(body=body, headers={'ETag': '"v1"'}))
+        self.assertEqual(["Show.S01E02.HDTV.x264-GRP"], found)
+        self.release(found)
+        # The feed state is not saved so the failed entry is not skipped as unchanged
+        self.assertIsNone(rss.get_feed_cache().get(feed.feed_key("http")))
+        self.assertIsNone(rss.get_feed_cache().get(feed.feed_key("last")))
+        self.failing = set()
+        self.assertEqual(["Show.S01E01.HDTV.x264-GRP"], self.poll(feed, FakeResponse(body=body, headers={'ETag': '"v1"'})))
+        self.assertEqual({}, self.requests[1])
+        self.assertEqual(3, len(self.downloads))
+        self.assertEqual({'etag': '"v1"'}, rss.get_feed_cache().get(feed.feed_key("http")))
+
+    def test_undecided(self):
+        feed = RSSFeed("rss_test")
+        ignored = "Show.S01.HDTV.x264-GRP"
+        movie = "Movie.2014.1080p.BluRay.x264-GRP"
+        self.sections = {movie: None}
+        body = build_feed(movie, ignored)
+        self.assertEqual([], self.poll(feed, FakeResponse(body=body)))
+        self.assertIn("https://example.com/download/" + ignored, feed.seen)
+        self.assertNotIn("https://example.com/download/" + movie, feed.seen)
+        self.assertIsNone(rss.get_feed_cache().get(feed.feed_key("last")))
+        # Matched once the lookup succeeds
+        self.sections = {movie: "section_movies"}
+        self.assertEqual([movie], self.poll(feed, FakeResponse(body=body)))
+
+    def test_lookup_failure(self):
+        # Matched by the parser, only the metadata lookups are replaced
+        parser.match_releases = self.match_releases
+        parser.match_cache.clear()
+        kinds = {"Movie": "movie", "Series": "series", "Unknown": None, "No.Score": "movie", "Low.Score": "movie"}
+        scores = {"Movie": 7.5, "Series": 8, "Unknown": 8, "No.Score": None, "Low.Score": 0}
+        rating.media_kind = lambda title, year=None: kinds[title]
+        rating.score = lambda title, min_votes=0: scores[title]
+        app.config.set("section_movies", "score_min", "6")
+        app.config.set("section_movies", "score_max", "10")
+        try:
+            feed = RSSFeed("rss_test")
+            names = ["{0}.2014.1080p.BluRay.x264-GRP".format(title) for title in sorted(scores)]
+            body = build_feed(*names)
+            self.assertEqual(["Movie.2014.1080p.BluRay.x264-GRP"], self.poll(feed, FakeResponse(body=body)))
+            # Rejected by IMDB or the score are decided, failed lookups are retried
+            self.assertEqual({"Low.Score", "Movie", "Series"},
+                             {name.split(".2014")[0] for name in names if "https://example.com/download/" + name in feed.seen})
+            self.assertIsNone(rss.get_feed_cache().get(feed.feed_key("last")))
+            self.release(["Movie.2014.1080p.BluRay.x264-GRP"])
+            parser.match_cache.clear()
+            kinds["Unknown"] = "series"
+            scores["No.Score"] = 0
+            self.assertEqual([], self.poll(feed, FakeResponse(body=body)))
+            self.assertEqual("https://example.com/download/" + names[0], rss.get_feed_cache().get(feed.feed_key("last")))
+        finally:
+            app.config.remove_option("section_movies", "score_min")
+            app.config.remove_option("section_movies", "score_max")
+            parser.match_cache.clear()
+
+    def test_existing(self):
+        feed = RSSFeed("rss_test")
+        release_name = "Show.S01E01.HDTV.x264-GRP"
+        self.sections = {release_name: "section_tv"}
+        provider.history.index.add(datastore.generate_release_key(release_name))
+        self.assertEqual([], self.poll(feed, FakeResponse(body=build_feed(release_name))))
+        self.assertEqual([], self.downloads)
+        self.assertIn("https://example.com/download/" + release_name, feed.seen)
+
+    def test_claimed(self):
+        feed = RSSFeed("rss_test")
+        release_name = "Show.S01E01.HDTV.x264-GRP"
+        self.sections = {release_name: "section_tv"}
+        inflight.get_registry().claim(datastore.generate_release_key(release_name))
+        self.assertEqual([], self.poll(feed, FakeResponse(body=build_feed(release_name))))
+        # Checked again on the next poll in case the other download fails
+        self.assertNotIn("https://example.com/download/" + release_name, feed.seen)
+
+    def test_added_while_claiming(self):
+        feed = RSSFeed("rss_test")
+        release_name = "Show.S01E01.HDTV.x264-GRP"
+        release_key = datastore.generate_release_key(release_name)
+        # Added by another provider after this poll checked the download history
+        provider.history.index.add(release_key)
+        self.assertIsNone(feed.download_release(release_name, release_key, "https://example.com/1", "section_tv"))
+        self.assertEqual([], self.downloads)
+        self.assertNotIn(release_key, inflight.get_registry())
+        proper = "Show.S01E01.PROPER.HDTV.x264-GRP"
+        self.assertTrue(feed.download_release(proper, release_key, "https://example.com/1", "section_tv"))
+
+    def test_download_error(self):
+        feed = RSSFeed("rss_test")
+        release_key = datastore.generate_release_key("Show.S01E01.HDTV.x264-GRP")
+
+        def fetch_torrent(url, max_size=None, timeout=10):
+            raise Timeout()
+
+        net.fetch_torrent = fetch_torrent
+        with self.assertRaises(Timeout):
+            feed.download_release("Show.S01E01.HDTV.x264-GRP", release_key, "https://example.com/1", "section_tv")
+        self.assertNotIn(release_key, inflight.get_registry())
+
+    def test_missing_link(self):
+        feed = RSSFeed("rss_test")
+        release_name = "Show.S01E02.HDTV.x264-GRP"
+        self.sections = {release_name: "section_tv", "Show.S01E01.HDTV.x264-GRP": "section_tv"}
+        body = build_feed("Show.S01E01.HDTV.x264-GRP").replace(
+            b"<channel>", "<channel><item><title>{0}</title></item>".format(release_name).encode("utf-8"))
+        self.assertEqual(["Show.S01E01.HDTV.x264-GRP"], self.poll(feed, FakeResponse(body=body)))
+        self.assertIn(release_name, feed.seen)
+
+    def test_release_claims(self):
+        feed = RSSFeed("rss_test")
+        names = ["Show.S01E02.HDTV.x264-GRP", "Show.S01E01.HDTV.x264-GRP"]
+        self.sections = dict.fromkeys(names, "section_tv")
+        self.poll(feed, FakeResponse(body=build_feed(*names)))
+        release_keys = {datastore.generate_release_key(name) for name in names}
+        self.assertEqual(release_keys, feed.claimed)
+        # The poll was stopped before its torrents were queued
+        feed.release_claims()
+        self.assertEqual(set(), feed.claimed)
+        for release_key in release_keys:
+            self.assertNotIn(release_key, inflight.get_registry())
+
+    def test_seen_entries(self):
+        seen = SeenEntries("seen:test", 3)
+        seen.add_many(["a", "b", "c"])
+        seen.add_many(["a", "d"])
+        self.assertEqual(3, len(seen))
+        # The least recently added id is evicted first
+        self.assertNotIn("b", seen)
+        seen = SeenEntries("seen:test", 3)
+        self.assertEqual(["c", "a", "d"], list(seen._ids))
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import io
+import sqlite3
+from contextlib import closing
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+from tranny.titledb import TitleDB, normalize_title
+
+basics = """tconst\ttitleType\tprimaryTitle\toriginalTitle\tstartYear
+tt0110475\tmovie\tThe Mask\tThe Mask\t1994
+tt0001000\tmovie\tThe Mask\tThe Mask\t1961
+tt1796960\ttvSeries\tHomeland\tHomeland\t2011
+tt0000001\tshort\tCarmencita\tCarmencita\t1894
+tt0240772\tmovie\tOcean's Eleven\tOcean's Eleven\t2001
+tt0245429\tmovie\tSpirited Away\tSen to Chihiro no kamikakushi\t2001
+tt9999999\tmovie\tUnrated\tUnrated\t\\N
+"""
+
+ratings = """tconst\taverageRating\tnumVotes
+tt0110475\t6.9\t400000
+tt0001000\t5.0\t20
+tt1796960\t8.3\t350000
+tt0240772\t7.7\t600000
+tt0245429\t8.6\t800000
+"""
+
+
+class TitleDBTest(TestCase):
+    def setUp(self):
+        self.path = mkdtemp()
+        for name, data in [("basics.tsv", basics), ("ratings.tsv", ratings)]:
+            with io.open(join(self.path, name), "w", encoding="utf-8") as tsv_file:
+                tsv_file.write(data)
+        self.db = TitleDB(join(self.path, "imdb.db"))
+
+    def tearDown(self):
+        self.db.close()
+        rmtree(self.path)
+
+    def test_normalize_title(self):
+        self.assertEqual("the mask", normalize_title("The.Mask"))
+        self.assertEqual("oceans eleven", normalize_title("Ocean's Eleven"))
+        self.assertEqual("homeland", normalize_title(" Homeland_"))
+
+    def test_lookup(self):
+        self.assertFalse(self.db.available())
+        self.assertIsNone(self.db.lookup("The Mask"))
+        self.assertEqual(6, self.db.import_dumps(join(self.path, "basics.tsv"), join(self.path, "ratings.tsv")))
+        self.assertTrue(self.db.available())
+        info = self.db.lookup("The.Mask")
+        self.assertEqual((1994, "movie", 6.9, 400000), (info['year'], info['kind'], info['rating'], info['votes']))
+        self.assertEqual(1961, self.db.lookup("The Mask", 1962)['year'])
+        self.assertIsNone(self.db.lookup("The Mask", 2005))
+        self.assertEqual("tv series", self.db.lookup("Homeland")['kind'])
+        self.assertEqual(2001, self.db.lookup("Oceans.Eleven")['year'])
+        self.assertEqual(8.6, self.db.lookup("Sen to Chihiro no Kamikakushi")['rating'])
+        self.assertIsNone(self.db.lookup("Carmencita"))
+        self.assertIsNone(self.db.lookup("Unrated")['rating'])
+
+    def test_fuzzy_lookup(self):
+        self.assertIsNone(self.db.fuzzy_lookup("The Mask"))
+        self.db.import_dumps(join(self.path, "basics.tsv"), join(self.path, "ratings.tsv"))
+        self.assertEqual(1994, self.db.fuzzy_lookup("The Mask", 1994)['year'])
+        self.assertEqual("oceans eleven", self.db.fuzzy_lookup("Oceans Eleeven")['title'])
+        self.assertIsNone(self.db.fuzzy_lookup("Oceans Eleeven", min_ratio=99))
+        self.assertIsNone(self.db.fuzzy_lookup("Oceans Eleeven", 2010))
+
+    def test_fuzzy_lookup_without_index(self):
+        self.db.import_dumps(join(self.path, "basics.tsv"), join(self.path, "ratings.tsv"))
+        self.db.close()
+        with closing(sqlite3.connect(self.db.path)) as db:
+            db.execute("DROP TABLE trigram_sizes")
+        # Databases imported without a trigram index only match exact titles
+        self.assertEqual(2001, self.db.fuzzy_lookup("Oceans Eleven")['year'])
+        self.assertIsNone(self.db.fuzzy_lookup("Oceans Eleeven"))
+
+
+if __name__ == '__main__':
+    main()
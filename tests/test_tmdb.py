@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+from unittest import TestCase, main
+from requests import HTTPError, Response, Session
+from tranny import ratelimit
+from tranny.service import tmdb
+
+
+config = {
+    'images': {
+        'backdrop_sizes': ["w300"],
+        'base_url': "http://image.tmdb.org/t/p/",
+        'poster_sizes': ["w92"],
+        'profile_sizes': ["w45"]
+    }
+}
+
+
+class FakeSession(object):
+    """ Stands in for the shared requests session, answering each request with the
+    next queued status code and recording the URLs requested
+    """
+    def __init__(self, statuses=None):
+        self.statuses = list(statuses or [])
+        self.urls = []
+
+    def get(self, url, params=None):
+        self.urls.append(url)
+        response = Response()
+        response.url = url
+        response.status_code = self.statuses.pop(0) if self.statuses else 200
+        if "/configuration" in url:
+            data = config
+        elif "/search/movie" in url:
+            page = int(url.rsplit("page=", 1)[1])
+            data = {
+                'page': page,
+                'total_pages': 3,
+                'total_results': 6,
+                'results': [{'id': page * 10 + i, 'title': "Movie {0}".format(i)} for i in range(2)]
+            }
+        else:
+            data = {'status_code': response.status_code}
+        response._content = json.dumps(data).encode("utf-8")
+        return response
+
+    def count(self, path):
+        return len([url for url in self.urls if path in url])
+
+
+class TMDBTest(TestCase):
+    def setUp(self):
+        self.session = tmdb.session
+        self.cfg = dict(tmdb.cfg)
+        self.limiter = ratelimit._limiters.get("themoviedb")
+        ratelimit._limiters["themoviedb"] = ratelimit.RateLimiter(1000, burst=100, max_backoff=0)
+        tmdb.configure("key")
+
+    def tearDown(self):
+        tmdb.session = self.session
+        tmdb.cfg.clear()
+        tmdb.cfg.update(self.cfg)
+        if self.limiter is None:
+            del ratelimit._limiters["themoviedb"]
+        else:
+            ratelimit._limiters["themoviedb"] = self.limiter
+
+    def test_retry(self):
+        tmdb.session = FakeSession([429, 503])
+        self.assertEqual({'status_code': 200}, tmdb.Core().getJSON("http://tmdb/retry"))
+        self.assertEqual(3, len(tmdb.session.urls))
+        self.assertEqual(2, ratelimit._limiters["themoviedb"].stats()['throttled'])
+
+    def test_retry_exhausted(self):
+        tmdb.session = FakeSession([429] * tmdb.MAX_ATTEMPTS)
+        self.assertRaises(HTTPError, tmdb.Core().getJSON, "http://tmdb/retry")
+        self.assertEqual(tmdb.MAX_ATTEMPTS, len(tmdb.session.urls))
+
+    def test_session(self):
+        self.assertIsInstance(self.session, Session)
+        for prefix in ["http://", "https://"]:
+            self.assertEqual(10, self.session.get_adapter(prefix + "api.themoviedb.org")._pool_maxsize)
+
+    def test_update_configuration(self):
+        tmdb.session = FakeSession()
+        core = tmdb.Core()
+        core.update_configuration()
+        core.update_configuration()
+        tmdb.Core().update_configuration()
+        self.assertEqual(1, tmdb.session.count("/configuration"))
+        self.assertEqual("http://image.tmdb.org/t/p/", tmdb.cfg['api']['base.url'])
+        tmdb.cfg['api']['updated'] -= tmdb.CONFIG_TTL + 1
+        core.update_configuration()
+        self.assertEqual(2, tmdb.session.count("/configuration"))
+
+    def test_iter_pages(self):
+        tmdb.session = FakeSession()
+        movies = tmdb.Movies("The Mask")
+        self.assertEqual(1, tmdb.session.count("/search/movie"))
+        pages = movies.iter_pages()
+        self.assertEqual(1, next(pages)['page'])
+        self.assertEqual(1, tmdb.session.count("/search/movie"))
+        self.assertEqual(2, next(pages)['page'])
+        self.assertEqual(2, tmdb.session.count("/search/movie"))
+        self.assertEqual([3], [page['page'] for page in pages])
+        self.assertEqual(3, tmdb.session.count("/search/movie"))
+        self.assertEqual([1, 2, 3], [page['page'] for page in movies.iter_pages()])
+        self.assertEqual(3, tmdb.session.count("/search/movie"))
+
+    def test_iter_pages_limit(self):
+        tmdb.session = FakeSession()
+        movies = tmdb.Movies("The Mask", limit=True)
+        self.assertEqual([10, 11], [movie['id'] for movie in movies.iter_results()])
+        self.assertEqual(1, tmdb.session.count("/search/movie"))
+
+    def test_iter_pages_prefetch(self):
+        tmdb.session = FakeSession()
+        movies = tmdb.Movies("The Mask")
+        results = [movie['id'] for movie in movies.iter_results(prefetch=2)]
+        self.assertEqual([10, 11, 20, 21, 30, 31], results)
+        self.assertEqual(3, tmdb.session.count("/search/movie"))
+
+
+if __name__ == '__main__':
+    main()
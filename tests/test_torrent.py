@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from hashlib import sha1
+from unittest import TestCase, main
+from tranny.exceptions import InvalidTorrent
+from tranny.torrent import TorrentStream, bencode
+
+
+class TorrentStreamTest(TestCase):
+    info = {'name': 'Show.Name.S01E01.720p.HDTV.x264-GRP.mkv', 'piece length': 262144,
+            'pieces': sha1('a').digest() * 100, 'length': 26214400}
+    data = bencode({'announce': 'http://tracker.example.com/announce', 'info': info, 'private': 1})
+
+    def stream(self, data, chunk_size=1, max_size=0):
+        stream = TorrentStream(max_size)
+        for i in range(0, len(data), chunk_size):
+            stream.feed(data[i:i + chunk_size])
+        return stream.finish()
+
+    def test_valid(self):
+        info_hash = sha1(bencode(self.info)).hexdigest()
+        for chunk_size in [1, 3, 100, len(self.data)]:
+            self.assertEqual((self.data, info_hash), self.stream(self.data, chunk_size))
+
+    def test_invalid(self):
+        for data in ["<html><body>Error</body></html>", "d4:infoi1ee", "d4:infod1:ai01eee", self.data[:-1],
+                     self.data + "e", bencode({'announce': 'http://tracker.example.com/announce'})]:
+            self.assertRaises(InvalidTorrent, self.stream, data)
+
+    def test_max_size(self):
+        self.assertRaises(InvalidTorrent, self.stream, self.data, 100, len(self.data) - 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import sqlite3
+from unittest import TestCase, main
+from tranny.trigram import TrigramIndex, StoredTrigramIndex, trigrams
+
+
+class TrigramIndexTest(TestCase):
+    titles = ["the mask", "the mark", "mask of zorro", "homeland", "the wire", "the walking dead"]
+
+    def test_trigrams(self):
+        self.assertEqual({"  a", " ab", "abc", "bc "}, trigrams("abc"))
+
+    def test_candidates(self):
+        index = TrigramIndex(self.titles)
+        self.assertEqual(len(self.titles), len(index))
+        candidates = index.candidates("the mask", limit=3)
+        self.assertEqual(3, len(candidates))
+        self.assertEqual((1.0, "the mask"), candidates[0])
+        self.assertEqual([], index.candidates("xyz"))
+
+    def test_search(self):
+        index = TrigramIndex(self.titles)
+        self.assertEqual("the walking dead", index.search("walking dead")[0][1])
+        self.assertEqual("homeland", index.search("homelnd", min_ratio=80)[0][1])
+        self.assertEqual([], index.search("homelnd", min_ratio=95))
+        self.assertEqual(2, len(index.search("the ma", limit=2)))
+
+    def test_stored(self):
+        db = sqlite3.connect(":memory:")
+        self.assertFalse(StoredTrigramIndex.exists(db))
+        index = TrigramIndex(self.titles)
+        index.save(db)
+        self.assertTrue(StoredTrigramIndex.exists(db))
+        stored = StoredTrigramIndex(db)
+        self.assertEqual(len(self.titles), len(stored))
+        for query in ["the mask", "walking dead", "homelnd", "xyz"]:
+            self.assertEqual(index.candidates(query), stored.candidates(query))
+        self.assertEqual("homeland", stored.search("homelnd", min_ratio=80)[0][1])
+
+
+if __name__ == '__main__':
+    main()
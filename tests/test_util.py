@@ -7,6 +7,18 @@ class TestUtil(unittest.TestCase):
         self.assertTrue(util.contains([1, 3, 5], [1, 3, 5]))
         self.assertFalse(util.contains([1, 3, 5], [2, 4]))
 
+    def test_lru_cache(self):
+        cache = util.LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+        cache.set("d", 4, ttl=-1)
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual({'hits': 2, 'misses': 2, 'size': 1}, cache.stats())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -37,6 +37,10 @@ class Configuration(ConfigParser):
     """
     _config_path = None
 
+    # Incremented on every change to the loaded values so compiled lookups derived from the
+    # config (ignore rules, filter indexes, caches) know when to rebuild themselves
+    revision = 0
+
     def __init__(self):
         ConfigParser.__init__(self)
 
@@ -62,8 +66,27 @@ class Configuration(ConfigParser):
         """
         loaded = ConfigParser.read(self, file_names)
         #map(logger.debug, loaded)
+        self.revision += 1
         return loaded
 
+    def set(self, section, option, value=None):
+        ConfigParser.set(self, section, option, value)
+        self.revision += 1
+
+    def add_section(self, section):
+        ConfigParser.add_section(self, section)
+        self.revision += 1
+
+    def remove_option(self, section, option):
+        existed = ConfigParser.remove_option(self, section, option)
+        self.revision += 1
+        return existed
+
+    def remove_section(self, section):
+        existed = ConfigParser.remove_section(self, section)
+        self.revision += 1
+        return existed
+
     def get_default(self, section, option, default=False, cast=None):
         """ Fetch a config value from the database with an optional default value to use
         if the config does not exist.
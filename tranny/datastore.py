@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 from collections import defaultdict
+from re import compile, I
+from sqlalchemy import func
 from tranny import parser, models
 from tranny.extensions import db
 
@@ -8,36 +10,55 @@ cache_section = defaultdict(lambda: False)
 cache_release = defaultdict(lambda: False)
 cache_source = defaultdict(lambda: False)
 
+# Patterns release keys are built from, see generate_release_key. These must not be
+# changed as keys already stored in the downloads table would no longer match.
+_key_name_patterns = [
+    compile(r"^(?P<name>.+?)\bS?\d+[xe]\d+.+?$", I),
+    compile(r"^(?P<name>.+?)\b(?P<year>(19|20)\d{2})", I)
+]
+_key_info_patterns = [
+    compile(r"\b(?P<year>(19|20)\d{2}).(?P<month>\d{1,2}).(?P<day>\d{1,2})", I),
+    compile(r"\bS?(?P<season>\d+)[xe](?P<episode>\d+)\b", I),
+    compile(r"\b(?P<year>(19|20)\d{2}).", I)
+]
+
 
 def generate_release_key(release_name):
     """ Generate a key suitable for using as a database key value
 
+    The keys of previous downloads are stored in the downloads table, so the key format
+    must never change or those releases would be downloaded again. Keys are built with
+    the patterns in _key_name_patterns and _key_info_patterns rather than parser.tokenize
+    so parser improvements do not change them.
+
     :param release_name: Release name to generate a key from
     :type release_name: str, unicode
     :return: Database suitable key name
     :rtype: str
     """
     release_name = parser.normalize(release_name)
-    name = parser.parse_release(release_name)
+    for pattern in _key_name_patterns:
+        found = pattern.search(release_name)
+        if found:
+            name = parser.normalize(found.group("name"))
+            break
+    else:
+        return False
     if not name:
         return False
     name = name.lower()
-    try:
-        info = parser.parse_release_info(release_name)
-    except TypeError:
-        # No release info parsed use default value for key: name
-        pass
-    else:
-        if info:
-            key_set = set(info.keys())
-            if key_set == {"season", "episode"}:
-                name = "{}-{}_{}".format(name, info['season'], info['episode'])
-            elif key_set == {"year", "day", "month"}:
-                name = "{}-{}_{}_{}".format(name, info['year'], info['month'], info['day'])
-            elif key_set == {"year"}:
-                name = "{}-{}".format(name, info['year'])
-    finally:
-        return name
+    for pattern in _key_info_patterns:
+        # Searched from the third character, as keys have always been
+        found = pattern.search(release_name, 2)
+        if not found:
+            continue
+        values = found.groupdict()
+        if "day" in values:
+            return "{}-{}_{}_{}".format(name, values['year'], values['month'].zfill(2), values['day'].zfill(2))
+        elif "season" in values:
+            return "{}-{}_{}".format(name, int(values['season']), int(values['episode']))
+        return "{}-{}".format(name, int(values['year']))
+    return name
 
 
 def get_section(section_name=None, section_id=None):
@@ -91,6 +112,51 @@ def fetch_download(release_key=None, entity_id=None, limit=None):
     return data_set
 
 
+def existing_release_keys(release_keys, chunk_size=500):
+    """ Find which of the release keys provided have already been downloaded. Only the
+    key column is selected and the keys are checked in chunks of chunk_size per query
+    to stay under the SQL parameter limits.
+
+    :param release_keys: Release keys to check, see generate_release_key
+    :type release_keys: unicode[]
+    :param chunk_size: Maximum number of keys checked by a single query
+    :type chunk_size: int
+    :return: Release keys found in the downloads table
+    :rtype: set
+    """
+    release_keys = list({key for key in release_keys if key})
+    found = set()
+    for i in range(0, len(release_keys), chunk_size):
+        query = db.session.query(models.DownloadEntity.release_key).\
+            filter(models.DownloadEntity.release_key.in_(release_keys[i:i + chunk_size]))
+        found.update(row[0] for row in query)
+    return found
+
+
+def count_downloads_by_source():
+    """ Count the downloads of each source in the database
+
+    :return: (source_name, total) pairs
+    :rtype: tuple[]
+    """
+    return db.session.query(models.Source.source_name, func.count(models.DownloadEntity.entity_id)).\
+        join(models.DownloadEntity, models.DownloadEntity.source_id == models.Source.source_id).\
+        group_by(models.Source.source_name).\
+        all()
+
+
+def count_downloads_by_section():
+    """ Count the downloads of each section in the database
+
+    :return: (section_name, total) pairs
+    :rtype: tuple[]
+    """
+    return db.session.query(models.Section.section_name, func.count(models.DownloadEntity.entity_id)).\
+        join(models.DownloadEntity, models.DownloadEntity.section_id == models.Section.section_id).\
+        group_by(models.Section.section_name).\
+        all()
+
+
 def fetch_user(user_name=None, user_id=None, limit=None):
     """
 
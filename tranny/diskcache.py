@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent key/value cache stored in a local SQLite database
+"""
+from __future__ import unicode_literals
+import json
+import sqlite3
+from os.path import expanduser, dirname, exists
+from time import time
+from tranny.configuration import mkdirp
+
+
+class DiskCache(object):
+    """
+    Key/value cache persisted to a SQLite database so its contents survive restarts.
+    Entries expire after their ttl and the least recently written entries are evicted
+    once the cache grows past max_size. All unexpired entries are loaded into memory
+    the first time the cache is used so lookups never need to touch the disk.
+
+    Values must be JSON serializable.
+    """
+    def __init__(self, path, table="cache", ttl=0, negative_ttl=None, max_size=0):
+        """
+        :param path: Path of the SQLite database file
+        :type path: unicode
+        :param table: Table name used to store the entries
+        :type table: unicode
+        :param ttl: Default number of seconds an entry is valid for, 0 for no expiry
+        :type ttl: int
+        :param negative_ttl: Default ttl used for empty values, defaults to the ttl. 0 to not
+        cache empty values at all
+        :type negative_ttl: int
+        :param max_size: Maximum number of entries to keep, 0 for unbounded
+        :type max_size: int
+        """
+        self.path = expanduser(path)
+        self.table = table
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._memory = {}
+
+    def __len__(self):
+        self._connect()
+        return len(self._memory)
+
+    def _connect(self):
+        """ Open the database, removing expired entries and loading the rest into memory
+
+        :return: Database connection
+        :rtype: sqlite3.Connection
+        """
+        if self._db is not None:
+            return self._db
+        if not exists(dirname(self.path)):
+            mkdirp(dirname(self.path))
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("CREATE TABLE IF NOT EXISTS {0} "
+                   "(key TEXT PRIMARY KEY, value TEXT, expires REAL, updated REAL)".format(self.table))
+        db.execute("CREATE INDEX IF NOT EXISTS {0}_updated ON {0} (updated)".format(self.table))
+        db.execute("DELETE FROM {0} WHERE expires > 0 AND expires < ?".format(self.table), (time(),))
+        db.commit()
+        rows = db.execute("SELECT key, value, expires FROM {0}".format(self.table))
+        self._memory = {key: (expires, json.loads(value)) for key, value, expires in rows}
+        self._db = db
+        return db
+
+    def get(self, key, default=None):
+        """ Fetch a value from the cache
+
+        :param key: Cache key
+        :type key: unicode
+        :param default: Value returned when the key is not cached or has expired
+        :return: Cached value
+        """
+        self._connect()
+        try:
+            expires, value = self._memory[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if expires and expires < time():
+            self.delete(key)
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        """ Store a value in the cache
+
+        :param key: Cache key
+        :type key: unicode
+        :param value: JSON serializable value
+        :param ttl: Seconds the value is valid for, defaults to the cache ttl or the
+        negative ttl for empty values
+        :type ttl: int
+        """
+        self.set_many([(key, value)], ttl)
+
+    def set_many(self, items, ttl=None):
+        """ Store several values in the cache using a single transaction
+
+        :param items: key, value pairs to store
+        :type items: (unicode, object)[]
+        :param ttl: Seconds the values are valid for, see set
+        :type ttl: int
+        """
+        db = self._connect()
+        now = time()
+        rows = []
+        skipped = []
+        for key, value in items:
+            entry_ttl = ttl
+            if entry_ttl is None:
+                if value or self.negative_ttl is None:
+                    entry_ttl = self.ttl
+                elif not self.negative_ttl:
+                    # Empty values are not cached, drop any previous value instead
+                    self._memory.pop(key, None)
+                    skipped.append((key,))
+                    continue
+                else:
+                    entry_ttl = self.negative_ttl
+            expires = now + entry_ttl if entry_ttl else 0
+            self._memory[key] = (expires, value)
+            rows.append((key, json.dumps(value), expires, now))
+        db.executemany("INSERT OR REPLACE INTO {0} (key, value, expires, updated) VALUES (?, ?, ?, ?)".format(
+            self.table), rows)
+        if skipped:
+            db.executemany("DELETE FROM {0} WHERE key = ?".format(self.table), skipped)
+        db.commit()
+        if self.max_size and len(self._memory) > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        """ Remove the oldest entries, leaving 10% headroom below max_size so eviction
+        does not run on every write
+        """
+        count = len(self._memory) - self.max_size + self.max_size // 10
+        rows = self._db.execute("SELECT key FROM {0} ORDER BY updated, rowid LIMIT ?".format(self.table), (count,))
+        keys = [row[0] for row in rows]
+        self._db.executemany("DELETE FROM {0} WHERE key = ?".format(self.table), [(key,) for key in keys])
+        self._db.commit()
+        for key in keys:
+            self._memory.pop(key, None)
+
+    def delete(self, key):
+        db = self._connect()
+        self._memory.pop(key, None)
+        db.execute("DELETE FROM {0} WHERE key = ?".format(self.table), (key,))
+        db.commit()
+
+    def clear(self):
+        db = self._connect()
+        self._memory.clear()
+        db.execute("DELETE FROM {0}".format(self.table))
+        db.commit()
+
+    def stats(self):
+        """ Fetch the current cache usage counters
+
+        :return: dict of hits, misses and size
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._memory)}
@@ -21,6 +21,11 @@ class InvalidResponse(BotchedTranny):
     pass
 
 
+class InvalidTorrent(InvalidResponse):
+    """ Downloaded torrent data is malformed or too large """
+    pass
+
+
 class ApiError(BotchedTranny):
     def __init__(self, error):
         self.message = error['message']
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming RSS and Atom feed parser. Entries are parsed incrementally as the document is
+read so callers can stop reading the feed once they reach entries they already have.
+"""
+from __future__ import unicode_literals
+from io import BytesIO
+from re import compile
+try:
+    from xml.etree.cElementTree import iterparse, ParseError
+except ImportError:
+    from xml.etree.ElementTree import iterparse, ParseError
+try:
+    from htmlentitydefs import name2codepoint
+except ImportError:
+    from html.entities import name2codepoint
+
+# Element names holding a single entry in RSS and Atom feeds
+_entry_tags = {"item", "entry"}
+
+# Entities defined by XML itself, any other named entity is undefined unless declared
+_xml_entities = {b"amp", b"lt", b"gt", b"quot", b"apos"}
+
+# Any & either starting a entity reference or standing on its own
+_pattern_ampersand = compile(br"&(?:(#[0-9]+|#x[0-9a-fA-F]+|[a-zA-Z_][a-zA-Z0-9_.-]*);)?")
+
+
+class _RecordingReader(object):
+    """ File like object keeping a copy of everything read from the source, so the
+    document can be parsed again if the streaming parse fails
+    """
+    def __init__(self, source):
+        self.source = source
+        self.chunks = []
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        self.chunks.append(data)
+        return data
+
+    def getvalue(self):
+        return b"".join(self.chunks) + self.source.read()
+
+
+def _local_name(tag):
+    """ Strip the namespace from a element tag, eg: {http://www.w3.org/2005/Atom}entry -> entry
+
+    :type tag: unicode
+    :rtype: unicode
+    """
+    return tag.rpartition("}")[2]
+
+
+def _parse_entry(element):
+    """ Convert a item/entry element into a dict using the same keys feedparser uses
+
+    :param element: Parsed item or entry element
+    :type element: xml.etree.ElementTree.Element
+    :return: dict of id, title and link
+    :rtype: dict
+    """
+    entry = {}
+    enclosure = None
+    for child in element:
+        name = _local_name(child.tag)
+        if name == "title":
+            entry['title'] = (child.text or "").strip()
+        elif name in ("guid", "id"):
+            entry['id'] = (child.text or "").strip()
+        elif name == "link":
+            href = child.get("href")
+            if href is None:
+                # RSS link
+                entry['link'] = (child.text or "").strip()
+            elif child.get("rel", "alternate") == "alternate":
+                entry['link'] = href
+            elif child.get("rel") == "enclosure":
+                enclosure = href
+        elif name == "enclosure":
+            enclosure = child.get("url")
+    if not entry.get('link') and enclosure:
+        entry['link'] = enclosure
+    return entry
+
+
+def _repair_entity(match):
+    """ Replace a HTML entity, which XML does not define, with its character reference
+    and escape a & which does not start a entity reference
+
+    :type match: _sre.SRE_Match
+    :rtype: str
+    """
+    name = match.group(1)
+    if name is None:
+        return b"&amp;"
+    if name.startswith(b"#") or name in _xml_entities:
+        return match.group()
+    code = name2codepoint.get(name.decode("ascii"))
+    if code is None:
+        return b"&amp;" + name + b";"
+    return "&#{0};".format(code).encode("ascii")
+
+
+def repair(document):
+    """ Fix the most common errors of hand built feeds, undefined HTML entities such as
+    &nbsp; and unescaped & characters, which a XML parser rejects
+
+    :param document: Raw feed document
+    :type document: str
+    :return: Repaired feed document
+    :rtype: str
+    """
+    return _pattern_ampersand.sub(_repair_entity, document)
+
+
+def _iter_elements(source):
+    """ Yield the entry elements of a feed document as they are parsed
+
+    :param source: File like object containing the feed document
+    :type source: file
+    :return: Generator of parsed entry elements
+    :rtype: generator
+    :raises: ParseError
+    """
+    parents = []
+    for event, element in iterparse(source, events=(str("start"), str("end"))):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local_name(element.tag) in _entry_tags:
+            yield element
+            if parents:
+                parents[-1].remove(element)
+
+
+def iter_entries(source):
+    """ Yield the entries of a RSS or Atom feed in document order. Each entry element
+    is discarded once parsed, so memory use does not grow with the size of the feed.
+
+    Feeds which are not well formed XML are parsed again from the start once repaired,
+    see repair, skipping the entries already yielded.
+
+    :param source: File like object containing the feed document
+    :type source: file
+    :return: Generator of entry dicts, see _parse_entry
+    :rtype: generator
+    :raises: ParseError
+    """
+    reader = _RecordingReader(source)
+    parsed = 0
+    try:
+        for element in _iter_elements(reader):
+            yield _parse_entry(element)
+            parsed += 1
+    except ParseError:
+        document = reader.getvalue()
+        repaired = repair(document)
+        if repaired == document:
+            raise
+    else:
+        return
+    for i, element in enumerate(_iter_elements(BytesIO(repaired))):
+        if i >= parsed:
+            yield _parse_entry(element)
@@ -6,7 +6,7 @@ import sys
 from collections import OrderedDict
 from flask import Blueprint
 from flask.ext.login import login_required
-from tranny import ui, util, models
+from tranny import ui, util, models, ratelimit
 
 home = Blueprint("home", __name__, url_prefix="/home")
 
@@ -15,7 +15,8 @@ home = Blueprint("home", __name__, url_prefix="/home")
 @login_required
 def index():
     newest = models.DownloadEntity.query.limit(25).all()
-    return ui.render_template("index.html", newest=newest, section="stats")
+    rate_limits = OrderedDict(sorted(ratelimit.stats().items()))
+    return ui.render_template("index.html", newest=newest, rate_limits=rate_limits, section="stats")
 
 
 @home.route("/syslog")
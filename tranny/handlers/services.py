@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 import httplib
-from flask import Blueprint, abort, request, flash, redirect, url_for
+from flask import Blueprint, abort, request, flash, redirect, url_for, current_app
 from flask.ext.login import login_required
 from tranny.app import config, logger
 from tranny import ui
@@ -31,3 +31,14 @@ def save(service):
         else:
             flash("There was an error saving your config")
         return redirect(url_for(".index"))
+
+
+@services.route("/poll/<service>", methods=['POST'])
+@login_required
+def poll(service):
+    if current_app.services.poll_now(service):
+        flash("Polling {0} now".format(service))
+    else:
+        flash("Unknown service: {0}".format(service))
+    # Feeds are polled from the RSS page
+    return redirect(request.referrer or url_for(".index"))
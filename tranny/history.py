@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+In memory index of the release keys in the download history, so checking whether a
+release was already downloaded does not need a database query on every poll.
+"""
+from __future__ import unicode_literals
+from array import array
+from bisect import bisect_left
+from tranny import app, models
+from tranny.extensions import db
+
+try:
+    # hash() returns a Py_ssize_t, which is wider than a C long on 64bit Windows
+    _hash_typecode = array(str("q")).typecode
+except ValueError:
+    # Python 2 has no long long arrays, its hash() returns a C long
+    _hash_typecode = str("l")
+
+
+class ReleaseIndex(object):
+    """
+    Set of the release keys already downloaded. Only the hash of each key is kept, in a
+    sorted array searched with bisect, so a history of a million releases takes a few
+    megabytes rather than the hundreds a set of the keys themselves would. Keys added
+    after loading are kept in a regular set until the next load.
+
+    As with any hash based filter two keys could share a hash, in which case a release
+    would be wrongly reported as downloaded. With 64bit hashes this is vanishingly rare.
+    """
+    def __init__(self):
+        self.loaded = False
+        self._hashes = array(_hash_typecode)
+        self._added = set()
+
+    def __contains__(self, release_key):
+        key_hash = hash(release_key)
+        if key_hash in self._added:
+            return True
+        i = bisect_left(self._hashes, key_hash)
+        return i < len(self._hashes) and self._hashes[i] == key_hash
+
+    def __len__(self):
+        return len(self._hashes) + len(self._added)
+
+    def load(self, batch_size=10000):
+        """ Load the release keys of every download from the database, replacing any keys
+        currently indexed. Only the release_key column is read, batch_size rows at a time.
+
+        :param batch_size: Number of rows fetched from the database at once
+        :type batch_size: int
+        :return: Number of release keys loaded
+        :rtype: int
+        """
+        query = db.session.query(models.DownloadEntity.release_key).yield_per(batch_size)
+        return self.build(row[0] for row in query)
+
+    def build(self, release_keys):
+        """ Replace the indexed keys with the release keys provided
+
+        :param release_keys: Release keys of every download
+        :type release_keys: unicode[]
+        :return: Number of release keys indexed
+        :rtype: int
+        """
+        self._hashes = array(_hash_typecode, sorted({hash(key) for key in release_keys}))
+        self._added = set()
+        self.loaded = True
+        return len(self._hashes)
+
+    def add(self, release_key):
+        """ Record a newly downloaded release
+
+        :param release_key: Release key, see datastore.generate_release_key
+        :type release_key: unicode
+        """
+        if release_key not in self:
+            self._added.add(hash(release_key))
+
+    def existing(self, release_keys):
+        """ Find which of the release keys provided have already been downloaded
+
+        :param release_keys: Release keys to check
+        :type release_keys: unicode[]
+        :return: Release keys already downloaded
+        :rtype: set
+        """
+        return {key for key in release_keys if key and key in self}
+
+
+index = ReleaseIndex()
+
+
+def load():
+    """ Load the release index from the download history. Until it is loaded, or if it
+    fails to load, lookups fall back to querying the database.
+
+    :return: Number of release keys loaded
+    :rtype: int
+    """
+    try:
+        count = index.load(app.config.get_default("general", "history_batch_size", 10000, int))
+    except Exception as err:
+        app.logger.exception(err)
+        return 0
+    app.logger.info("Loaded {0} release keys from the download history".format(count))
+    return count
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of the releases currently being downloaded and added by any provider. Providers
+claim a release before downloading it so the same release found by several providers
+in the same cycle is only fetched and added once.
+"""
+from __future__ import unicode_literals
+from time import time
+from tranny import app
+
+
+class InFlightRegistry(object):
+    """
+    Tracks claimed release keys and the info hashes of their downloaded torrents. Claims
+    are released once the release has been added, or automatically after ttl seconds in
+    case a claim is never released.
+
+    Greenlets only switch on I/O, so each claim is checked and taken atomically.
+    """
+    def __init__(self, ttl=600):
+        """
+        :param ttl: Seconds a claim is held if it is never released
+        :type ttl: int
+        """
+        self.ttl = ttl
+        # release key -> (expiry time, info hash)
+        self._releases = {}
+        # info hash -> release key
+        self._hashes = {}
+
+    def __contains__(self, release_key):
+        return self._active(release_key)
+
+    def __len__(self):
+        return len(self._releases)
+
+    def _active(self, release_key):
+        try:
+            expires, info_hash = self._releases[release_key]
+        except KeyError:
+            return False
+        if expires < time():
+            self.release(release_key)
+            return False
+        return True
+
+    def claim(self, release_key):
+        """ Claim a release before downloading it
+
+        :param release_key: Release key, see datastore.generate_release_key
+        :type release_key: unicode
+        :return: True if claimed, False if another provider already holds it
+        :rtype: bool
+        """
+        if self._active(release_key):
+            return False
+        self._releases[release_key] = (time() + self.ttl, None)
+        return True
+
+    def claim_hash(self, release_key, info_hash):
+        """ Record the info hash of a claimed release once its torrent is downloaded.
+        The same torrent can be listed under different release names by different
+        providers, so this catches duplicates the release key does not.
+
+        :param release_key: Release key claimed with claim
+        :type release_key: unicode
+        :param info_hash: Hex info hash of the downloaded torrent
+        :type info_hash: unicode
+        :return: True if claimed, False if another release holds the same info hash
+        :rtype: bool
+        """
+        owner = self._hashes.get(info_hash)
+        if owner is not None and owner != release_key and self._active(owner):
+            return False
+        expires = self._releases.get(release_key, (time() + self.ttl, None))[0]
+        self._releases[release_key] = (expires, info_hash)
+        self._hashes[info_hash] = release_key
+        return True
+
+    def release(self, release_key):
+        """ Release the claim on a release and its info hash
+
+        :param release_key: Release key claimed with claim
+        :type release_key: unicode
+        """
+        expires, info_hash = self._releases.pop(release_key, (None, None))
+        if info_hash and self._hashes.get(info_hash) == release_key:
+            del self._hashes[info_hash]
+
+
+_registry = None
+
+
+def get_registry():
+    """ Fetch the registry shared by all providers. It is created on first use so the
+    general.inflight_ttl value of the loaded config is used.
+
+    :return: Registry of the releases being downloaded
+    :rtype: InFlightRegistry
+    """
+    global _registry
+    if _registry is None:
+        _registry = InFlightRegistry(app.config.get_default("general", "inflight_ttl", 600, int))
+    return _registry
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 import platform
+import random
+from heapq import heappush, heappop
+from itertools import count
+from time import time
 import gevent
+from gevent.event import Event
+from gevent.pool import Pool
+from gevent.queue import Queue
 from sqlalchemy.exc import DBAPIError
-from tranny import app, datastore, watch, models, client
+from tranny import app, datastore, watch, models, client, inflight, history
 from tranny.provider.rss import RSSFeed
 from tranny.extensions import db
 from tranny.service import tmdb
@@ -18,6 +25,18 @@ class ServiceManager(object):
         self.feeds = []
         self.services = []
         self.client = None
+        # Torrents found by the providers waiting to be added, see process_adds
+        self.add_queue = Queue()
+        self._polling = set()
+        # Heap of (due time, sequence, provider) entries. Entries whose due time no longer
+        # matches _due for the provider have been replaced and are skipped.
+        self._schedule = []
+        self._due = {}
+        self._sequence = count()
+        self._wakeup = Event()
+        self._poll_pool = Pool(app.config.get_default("general", "provider_concurrency", 10, int))
+        self._adder = gevent.Greenlet(self.process_adds)
+        self._adder.start()
         self._updater = gevent.Greenlet(self.update_providers)
         self._updater.start_later(1)
         self.watch = None
@@ -37,6 +56,7 @@ class ServiceManager(object):
             pass
         else:
             tmdb.configure(tmdb_api_key)
+        history.load()
         #self.watch = watch.FileWatchService(self)
 
     @staticmethod
@@ -89,21 +109,107 @@ class ServiceManager(object):
                                           source.source_id)
                 db.session.add(download)
                 db.session.commit()
+                history.index.add(release_key)
         except DBAPIError as err:
             app.logger.exception(err)
             db.session.rollback()
         except Exception as err:
             app.logger.exception(err)
+        finally:
+            release_key = datastore.generate_release_key(torrent.release_name)
+            if release_key:
+                inflight.get_registry().release(release_key)
+
+    def process_adds(self):
+        """ Add the torrents queued by the providers one at a time so the client and
+        database session are never used by several providers at once """
+        while True:
+            torrent, service = self.add_queue.get()
+            self.add(torrent, service)
+
+    def poll_provider(self, service):
+        """ Fetch the matching torrents from a provider and queue them to be added.
+        Providers running longer than their timeout are stopped and any error is
+        logged without affecting the other providers.
+
+        :param service: Provider to poll
+        :type service: TorrentProvider
+        """
+        timeout = gevent.Timeout(service.timeout)
+        timeout.start()
+        try:
+            torrents = list(service.find_matches())
+        except gevent.Timeout as err:
+            # The torrents downloaded before the poll stopped are lost, let other providers fetch them
+            service.release_claims()
+            if err is not timeout:
+                raise
+            app.logger.warning("Timed out polling provider {0} after {1}s".format(service.name, service.timeout))
+        except Exception as err:
+            service.release_claims()
+            app.logger.exception(err)
+        else:
+            # The claims are released by add once each torrent is added
+            service.claimed.clear()
+            for torrent in torrents:
+                self.add_queue.put((torrent, service))
+        finally:
+            timeout.cancel()
+            self._polling.discard(service)
+            self.schedule(service, max(time(), service.last_update) + service.interval - time())
+
+    def schedule(self, service, delay):
+        """ Schedule the next poll of a provider, replacing any poll already scheduled.
+        A random delay of up to general.provider_jitter seconds is added so providers
+        sharing the same interval do not all fire together.
+
+        :param service: Provider to poll
+        :type service: TorrentProvider
+        :param delay: Seconds from now to poll the provider
+        :type delay: float
+        """
+        jitter = app.config.get_default("general", "provider_jitter", 5, float)
+        due = time() + max(0, delay) + random.uniform(0, jitter)
+        self._due[service] = due
+        heappush(self._schedule, (due, next(self._sequence), service))
+        self._wakeup.set()
+
+    def poll_now(self, config_section):
+        """ Poll a provider immediately instead of waiting for its next scheduled poll
+
+        :param config_section: Config section name of the provider, eg: rss_example
+        :type config_section: unicode
+        :return: True if the poll was started or is already running
+        :rtype: bool
+        """
+        for service in self.services:
+            if service.config_section == config_section:
+                if service not in self._polling:
+                    self._due[service] = 0
+                    heappush(self._schedule, (0, next(self._sequence), service))
+                    self._wakeup.set()
+                return True
+        return False
 
     def update_providers(self):
         """ This is the primary process loop used to process TorrentProvider
         classes. It is run independently from the web service inside its own
-        thread """
+        thread. It sleeps until the next provider is due, then polls it in its
+        own greenlet so a slow provider does not hold up the others. Providers are
+        rescheduled once their poll has finished. """
+        for service in self.services:
+            self.schedule(service, 0)
         while True:
-            for service in self.services:
-                for torrent in service.find_matches():
-                    self.add(torrent, service)
-            gevent.sleep(1)
+            now = time()
+            while self._schedule and self._schedule[0][0] <= now:
+                due, _, service = heappop(self._schedule)
+                if self._due.get(service) != due or service in self._polling:
+                    continue
+                del self._due[service]
+                self._polling.add(service)
+                self._poll_pool.spawn(self.poll_provider, service)
+            self._wakeup.clear()
+            self._wakeup.wait(self._schedule[0][0] - now if self._schedule else None)
 
     def start(self):
         self._updater.start()
@@ -3,9 +3,28 @@
 Functions used to download data over HTTP connections
 """
 from __future__ import unicode_literals
+from contextlib import contextmanager
 from os.path import join
-from requests import get, RequestException
+from urlparse import urlparse
+from gevent.lock import BoundedSemaphore
+from requests import Session, RequestException
+from requests.adapters import HTTPAdapter
+try:
+    from requests.packages.urllib3.util.retry import Retry
+except ImportError:
+    Retry = None
 from tranny import app, exceptions
+from tranny.torrent import TorrentStream
+
+# Shared connection pools, created by get_session
+_adapters = {}
+_session = None
+
+# Per host semaphores limiting the number of concurrent requests, see host_slot
+_host_slots = {}
+
+# Proxy settings cached along with the config revision they were read from
+_proxies = (None, {})
 
 # Conversion table mostly used for converting API values into common bytes
 speed_multi = {
@@ -32,6 +51,82 @@ speed_multi = {
 }
 
 
+def _get_adapters():
+    """ Create the keep-alive connection pools shared by every session from get_session and
+    new_session. Failed connections and 5xx responses are retried general.http_retries times.
+
+    :return: dict of url prefix to adapter
+    :rtype: dict
+    """
+    if not _adapters:
+        retries = app.config.get_default("general", "http_retries", 3, int)
+        if Retry is not None:
+            retries = Retry(total=retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+        adapter = HTTPAdapter(
+            pool_connections=app.config.get_default("general", "http_pool_hosts", 20, int),
+            pool_maxsize=app.config.get_default("general", "http_host_concurrency", 4, int),
+            max_retries=retries
+        )
+        _adapters["http://"] = adapter
+        _adapters["https://"] = adapter
+    return _adapters
+
+
+def new_session():
+    """ Create a session using the shared connection pools. Use this for providers needing
+    their own cookies, such as a login session, while still reusing open connections.
+
+    :return: New session
+    :rtype: requests.Session
+    """
+    session = Session()
+    for prefix, adapter in _get_adapters().items():
+        session.mount(prefix, adapter)
+    return session
+
+
+def get_session():
+    """ Fetch the process wide session used for requests not needing their own cookies
+
+    :return: Shared session
+    :rtype: requests.Session
+    """
+    global _session
+    if _session is None:
+        _session = new_session()
+    return _session
+
+
+def get_proxies():
+    """ Fetch the configured proxies, only reading them from the config again after it
+    has changed
+
+    :return: requests proxies dict
+    :rtype: dict
+    """
+    global _proxies
+    if _proxies[0] != app.config.revision:
+        _proxies = (app.config.revision, app.config.get_proxies())
+    return _proxies[1]
+
+
+@contextmanager
+def host_slot(url):
+    """ Wait for one of the general.http_host_concurrency request slots of the urls host
+    to become free, holding it until the context exits
+
+    :param url: URL being requested
+    :type url: basestring
+    """
+    host = urlparse(url).netloc
+    try:
+        slot = _host_slots[host]
+    except KeyError:
+        slot = _host_slots[host] = BoundedSemaphore(app.config.get_default("general", "http_host_concurrency", 4, int))
+    with slot:
+        yield
+
+
 def download(release_name, url, dest_path="./", extension=".torrent"):
     """ Download a file to a local file path
 
@@ -49,7 +144,7 @@ def download(release_name, url, dest_path="./", extension=".torrent"):
     app.logger.info("Downloading release [{0}]: {1}".format(release_name, url))
     file_path = join(dest_path, release_name) + extension
     dl_ok = False
-    response = fetch_url(url)
+    response = fetch_url(url, json=False)
     if response:
         with open(file_path, 'wb') as torrent_file:
             torrent_file.write(response)
@@ -68,20 +163,75 @@ def fetch_url(url, auth=None, json=True, timeout=10):
     response = None
     try:
         app.logger.debug("Fetching url: {0}".format(url))
-        response = get(url, auth=auth, proxies=app.config.get_proxies(), timeout=timeout)
+        with host_slot(url):
+            response = get_session().get(url, auth=auth, proxies=get_proxies(), timeout=timeout)
         response.raise_for_status()
         if not response.content:
             raise exceptions.InvalidResponse("Empty response body")
-    except (RequestException, exceptions.InvalidResponse) as err:
+        response = response.json() if json else response.content
+    except (RequestException, exceptions.InvalidResponse, ValueError) as err:
         app.logger.exception(err.message)
-    else:
-        response = response.content
-        if json:
-            response = response.json()
+        response = None
     finally:
         return response
 
 
+@contextmanager
+def open_url(url, headers=None, timeout=10):
+    """ Open a streaming request to the url provided. The body is read from the raw
+    attribute of the response, decompressed, and the connection is returned to the
+    pool once the context exits.
+
+    :param url: URL to fetch
+    :type url: basestring
+    :param headers: Extra request headers
+    :type headers: dict
+    :param timeout: Connect and read timeout in seconds
+    :type timeout: int
+    :return: HTTP response
+    :rtype: requests.Response
+    :raises: RequestException
+    """
+    app.logger.debug("Opening url: {0}".format(url))
+    with host_slot(url):
+        response = get_session().get(url, headers=headers, proxies=get_proxies(), timeout=timeout, stream=True)
+        try:
+            response.raw.decode_content = True
+            yield response
+        finally:
+            response.close()
+
+
+def fetch_torrent(url, max_size=None, timeout=10):
+    """ Download a .torrent file, validating it while it is received. Downloads larger than
+    general.torrent_max_size or not containing bencoded torrent data are abandoned as soon
+    as that is detected.
+
+    :param url: URL of the .torrent file
+    :type url: basestring
+    :param max_size: Maximum size in bytes, defaults to general.torrent_max_size
+    :type max_size: int
+    :param timeout: Connect and read timeout in seconds
+    :type timeout: int
+    :return: Torrent data and hex info hash or None on failure
+    :rtype: (str, str), None
+    """
+    if max_size is None:
+        max_size = app.config.get_default("general", "torrent_max_size", 10485760, int)
+    stream = TorrentStream(max_size)
+    try:
+        with open_url(url, timeout=timeout) as response:
+            response.raise_for_status()
+            if max_size and int(response.headers.get('Content-Length') or 0) > max_size:
+                raise exceptions.InvalidTorrent("Torrent larger than maximum size of {0} bytes".format(max_size))
+            for chunk in response.iter_content(16384):
+                stream.feed(chunk)
+        return stream.finish()
+    except (RequestException, exceptions.InvalidResponse) as err:
+        app.logger.error("Failed to download torrent {0}: {1}".format(url, err))
+        return None
+
+
 def parse_net_speed_value(input_speed):
     value, suffix = input_speed.replace("/s", "").split()
     parsed_value = float(speed_multi[suffix](float(value)))
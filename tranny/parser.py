@@ -4,31 +4,391 @@ File name parser/tokenizer functions
 """
 from __future__ import unicode_literals
 from ConfigParser import NoSectionError, NoOptionError
-from re import compile, I, match
+from re import compile, escape, error as RegexError, I, X
+from collections import OrderedDict
 from datetime import date
-from tranny import app
+from gevent.pool import Pool
+from tranny import app, util
 from tranny.service import rating
 
 
-pattern_info = [
-    compile(r"\b(?P<year>(19|20)\d{2}).(?P<month>\d{1,2}).(?P<day>\d{1,2})", I),
-    compile(r"\bS?(?P<season>\d+)[xe](?P<episode>\d+)\b", I),
-    compile(r"\b(?P<year>(19|20)\d{2}).", I)
-]
-
-pattern_release = [
-    compile(r"^(?P<name>.+?)\bS?\d+[xe]\d+.+?$", I),
-    compile(r"^(?P<name>.+?)\b(?P<year>(19|20)\d{2})", I),
-]
-
-pattern_date = [
-    compile(r"(?P<year>(19|20)\d{2})", I)
-]
+# Release name words with a fixed meaning, keyed by their lower cased form
+word_tokens = {}
+for _value in ["hdtv", "pdtv", "sdtv", "dsr", "web-dl", "webdl", "webrip", "web-rip", "web", "bluray", "blu-ray",
+               "bdrip", "brrip", "dvdrip", "dvdscr", "dvd", "hdrip"]:
+    word_tokens[_value] = ("source", _value)
+for _value in ["x264", "x265", "h264", "h265", "hevc", "avc", "xvid", "divx"]:
+    word_tokens[_value] = ("codec", _value)
+for _value in ["480", "576", "720", "1080", "2160"]:
+    for _suffix in ["", "p", "i"]:
+        word_tokens[_value + _suffix] = ("resolution", _value + _suffix)
+word_tokens["proper"] = ("proper", True)
+word_tokens["repack"] = ("repack", True)
+word_tokens["rerip"] = ("repack", True)
+
+# Matches a whole lower cased word which marks an episode, a year or a hyphenated daily date.
+# Further episodes of multi episode releases (s01e01e02, s01e01-e02) and a trailing group
+# name (s01e01-grp) may follow the marker in the same word.
+pattern_word = compile(r"""[\[(]?(?:
+    s?(?P<season>\d+)[xe](?P<episode>\d+)(?:-?e\d+)*
+    |(?P<year>(?:19|20)\d{2})(?:[_/-](?P<month>\d{1,2})[_/-](?P<day>\d{1,2}))?
+)(?:-(?P<group>[^.\])]*[a-z][^.\])]*))?[\])]?$""", X)
+
+# First characters of the words pattern_word can match
+_marker_chars = frozenset("0123456789s[(")
 
 pattern_season = [
     compile(r"[\.\s]s\d{1,2}[\.\s]", I)
 ]
 
+# Compiled ignore rules keyed by config section name, see get_ignore_matcher
+_ignore_matchers = {}
+
+# Show filter indexes keyed by (section, option), see get_title_index
+_title_indexes = {}
+
+# Section decisions made by match_release keyed by normalized release name. Cleared
+# whenever the config changes, see _check_match_cache
+match_cache = util.LRUCache()
+_match_cache_revision = None
+
+# Marks a match cache miss, as None is a valid cached decision
+_missing = object()
+
+# Resolutions considered high definition by find_quality
+_hd_resolutions = ("720", "1080", "2160")
+
+# Recently tokenized release names, cleared once it reaches _token_cache_size entries
+_token_cache = {}
+_token_cache_size = 4096
+
+
+class ReleaseInfo(object):
+    """
+    Structured values parsed from a release name by :func:`tokenize`
+    """
+    __slots__ = ['name', 'title', 'year', 'season', 'episode', 'date', 'resolution', 'source',
+                 'codec', 'group', 'proper', 'repack']
+
+    def __init__(self, name):
+        self.name = name
+        self.title = None
+        self.year = None
+        self.season = None
+        self.episode = None
+        self.date = None
+        self.resolution = None
+        self.source = None
+        self.codec = None
+        self.group = None
+        self.proper = False
+        self.repack = False
+
+    def __repr__(self):
+        return "<ReleaseInfo('{0}')>".format(self.name)
+
+    @property
+    def is_daily(self):
+        return self.date is not None
+
+    @property
+    def is_episode(self):
+        return self.season is not None
+
+    @property
+    def quality(self):
+        """ Quality class of the release, either hd or sd
+
+        :rtype: unicode
+        """
+        if self.resolution and self.resolution.startswith(_hd_resolutions):
+            return "hd"
+        return "sd"
+
+    @property
+    def info(self):
+        """ Dict of the episode, daily date or year info, matching the format returned
+        by :func:`parse_release_info`
+
+        :rtype: dict, bool
+        """
+        if self.date:
+            year, month, day = self.date
+            return {'year': "{0}".format(year), 'month': "{0:02d}".format(month), 'day': "{0:02d}".format(day)}
+        elif self.season is not None:
+            return {'season': self.season, 'episode': self.episode}
+        elif self.year:
+            return {'year': self.year}
+        return False
+
+
+def tokenize(release_name):
+    """ Parse a release name into a :class:`ReleaseInfo` in a single pass over its
+    words. Results are cached so repeated lookups of the same name are free.
+
+    :param release_name: Full release name eg: Conan.2013.04.15.Chelsea.Handler.HDTV.x264-2HD
+    :type release_name: unicode
+    :return: Parsed release info
+    :rtype: ReleaseInfo
+    """
+    try:
+        return _token_cache[release_name]
+    except KeyError:
+        pass
+    info = ReleaseInfo(release_name)
+    words = release_name.lower().replace(" ", ".").split(".")
+    last = len(words) - 1
+    title_end = None
+    year_end = None
+    for i, word in enumerate(words):
+        if not word:
+            continue
+        token = word_tokens.get(word)
+        if token is None:
+            if word[0] in _marker_chars:
+                found = pattern_word.match(word)
+                if found:
+                    if found.group("group") and i == last:
+                        info.group = release_name.rsplit("-", 1)[1].rstrip("])") or None
+                    if found.group("season"):
+                        if info.season is None:
+                            info.season = int(found.group("season"))
+                            info.episode = int(found.group("episode"))
+                            title_end = i
+                    elif i:
+                        # A leading year is part of the title, eg: 2012.2009.720p.BluRay.x264-XX
+                        year = int(found.group("year"))
+                        if info.date is None:
+                            if found.group("month"):
+                                info.date = (year, int(found.group("month")), int(found.group("day")))
+                            elif i + 2 <= last and words[i + 1].isdigit() and len(words[i + 1]) <= 2 \
+                                    and words[i + 2][:2].isdigit():
+                                info.date = (year, int(words[i + 1]), int(words[i + 2][:2]))
+                        if info.year is None:
+                            info.year = year
+                            year_end = i
+                    continue
+            if "-" in word:
+                if i == last:
+                    info.group = release_name.rsplit("-", 1)[1].rstrip("]") or None
+                word = word.strip("-[]()")
+                token = word_tokens.get(word) or word_tokens.get(word.split("-", 1)[0])
+            elif word == "h" and i < last and words[i + 1][:3] in ("264", "265"):
+                token = ("codec", "h." + words[i + 1][:3])
+            else:
+                token = word_tokens.get(word.strip("[]()"))
+            if token is None:
+                continue
+        kind, value = token
+        if kind == "proper":
+            info.proper = True
+        elif kind == "repack":
+            info.repack = True
+        elif getattr(info, kind) is None:
+            setattr(info, kind, value)
+    if title_end is None:
+        title_end = year_end
+    if title_end:
+        info.title = normalize(".".join(release_name.replace(" ", ".").split(".")[:title_end])) or None
+    if len(_token_cache) >= _token_cache_size:
+        _token_cache.clear()
+    _token_cache[release_name] = info
+    return info
+
+
+def _trie_pattern(words):
+    """ Build a regex pattern matching any of the words provided. Common prefixes are
+    shared so the regex engine walks the words as a trie instead of trying each one.
+
+    :param words: Literal strings to match
+    :type words: unicode[]
+    :return: Regex pattern
+    :rtype: unicode
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+    return _trie_node_pattern(trie)
+
+
+def _trie_node_pattern(node):
+    alternatives = [escape(char) + _trie_node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ""
+    optional = "" in node
+    if len(alternatives) == 1 and not optional:
+        return alternatives[0]
+    return "(?:{0}){1}".format("|".join(alternatives), "?" if optional else "")
+
+
+class IgnoreMatcher(object):
+    """
+    Compiled form of an ignore config section. All string rules are merged into a single
+    trie pattern and all rx rules into a single alternation so a release name is checked
+    with at most two regex scans no matter how many rules are defined.
+    """
+    # Rules which cannot be merged into the alternation and are matched on their own: back
+    # references, as group numbers shift when combined, named groups, as names may clash
+    # between rules, and inline flags, which would apply to every rule
+    _single = compile(r"\\[1-9]|\(\?P|\(\?[aiLmsux-]+[:)]")
+
+    def __init__(self, config, section_name="ignore"):
+        """
+        :param config: Configuration to load the rules from
+        :type config: tranny.configuration.Configuration
+        :param section_name: Config section containing the ignore rules
+        :type section_name: unicode
+        """
+        self.revision = config.revision
+        self._strings = {}
+        self._rx_keys = []
+        self._rx_single = []
+        rx_rules = []
+        try:
+            keys = config.options(section_name)
+        except NoSectionError:
+            keys = []
+        for key in keys:
+            try:
+                value = config.get(section_name, key)
+            except (NoSectionError, NoOptionError):
+                continue
+            if not value:
+                continue
+            if key.startswith("string"):
+                self._strings[value.lower()] = key
+            elif key.startswith("rx"):
+                try:
+                    pattern = compile(value, I)
+                except RegexError:
+                    app.logger.warning("Invalid regex ignore pattern {0}: {1}".format(key, value))
+                    continue
+                if self._single.search(value):
+                    self._rx_single.append((key, pattern))
+                else:
+                    rx_rules.append((key, value))
+            else:
+                app.logger.warning("Invalid ignore configuration key found: {0}".format(key))
+        self._string_rx = compile(_trie_pattern(self._strings)) if self._strings else None
+        self._rx = None
+        if rx_rules:
+            try:
+                self._rx = compile("|".join("(?P<r{0}>{1})".format(i, value) for i, (_, value) in
+                                            enumerate(rx_rules)), I)
+            except RegexError as err:
+                app.logger.warning("Failed to combine regex ignore patterns, matching separately: {0}".format(err))
+                self._rx_single.extend((key, compile(value, I)) for key, value in rx_rules)
+            else:
+                self._rx_keys = [key for key, _ in rx_rules]
+
+    def match(self, release_name):
+        """ Find the ignore rule matching the release name
+
+        :param release_name: Lower cased release name
+        :type release_name: unicode
+        :return: Key name of the matched rule or None
+        :rtype: unicode, None
+        """
+        if self._string_rx:
+            found = self._string_rx.search(release_name)
+            if found:
+                return self._strings[found.group()]
+        if self._rx:
+            found = self._rx.match(release_name)
+            if found:
+                return self._rx_keys[int(found.lastgroup[1:])]
+        for key, pattern in self._rx_single:
+            if pattern.match(release_name):
+                return key
+        return None
+
+
+def get_ignore_matcher(section_name="ignore"):
+    """ Fetch the compiled ignore rules for a section, rebuilding them if the config
+    has changed since they were compiled.
+
+    :param section_name: Config section containing the ignore rules
+    :type section_name: unicode
+    :rtype: IgnoreMatcher
+    """
+    matcher = _ignore_matchers.get(section_name)
+    if matcher is None or matcher.revision != app.config.revision:
+        matcher = IgnoreMatcher(app.config, section_name)
+        _ignore_matchers[section_name] = matcher
+    return matcher
+
+
+class TitleIndex(object):
+    """
+    Token trie of the show titles defined in a section filter option. A release name is
+    matched by walking its leading title tokens down the trie so the lookup cost depends
+    on the length of the title rather than the number of titles being watched.
+    """
+    def __init__(self, config, section_name, option):
+        """
+        :param config: Configuration to load the titles from
+        :type config: tranny.configuration.Configuration
+        :param section_name: Config section name eg: section_tv
+        :type section_name: unicode
+        :param option: Filter option name eg: quality_hd
+        :type option: unicode
+        """
+        self.revision = config.revision
+        self._trie = {}
+        if config.has_option(section_name, option):
+            for title in config.build_regex_fetch_list(section_name, option):
+                self.add(title)
+
+    def add(self, title):
+        """ Add a normalized title to the index
+
+        :param title: Title eg: The.Daily.Show
+        :type title: unicode
+        """
+        node = self._trie
+        for token in clean_split(title.lower()):
+            node = node.setdefault(token, {})
+        if node is not self._trie:
+            node[None] = title
+
+    def find(self, tokens):
+        """ Find the shortest indexed title the tokens start with
+
+        :param tokens: Lower cased release name tokens, see clean_split
+        :type tokens: unicode[]
+        :return: Matched title or None
+        :rtype: unicode, None
+        """
+        node = self._trie
+        for token in tokens:
+            try:
+                node = node[token]
+            except KeyError:
+                return None
+            if None in node:
+                return node[None]
+        return None
+
+
+def get_title_index(section_name, option):
+    """ Fetch the title index for a section filter option, rebuilding it if the config
+    has changed since it was built.
+
+    :param section_name: Config section name eg: section_tv
+    :type section_name: unicode
+    :param option: Filter option name eg: quality_hd
+    :type option: unicode
+    :rtype: TitleIndex
+    """
+    index = _title_indexes.get((section_name, option))
+    if index is None or index.revision != app.config.revision:
+        index = TitleIndex(app.config, section_name, option)
+        _title_indexes[(section_name, option)] = index
+    return index
+
 
 def normalize(name):
     return str('.'.join(clean_split(name)))
@@ -79,7 +439,7 @@ def valid_score(release_name, section_name="section_movies"):
 
     :type release_name: unicode
     :type section_name: unicode
-    :return:
+    :return: Score status, None if the score could not be looked up
     :rtype: bool, None
     """
     release_name = parse_release(release_name)
@@ -101,6 +461,8 @@ def valid_score(release_name, section_name="section_movies"):
         score_votes = 0
     if release_name:
         found_score = rating.score(release_name, min_votes=score_votes)
+        if found_score is None:
+            return None
         return bool(found_score)
     return False
 
@@ -110,58 +472,59 @@ def is_movie(release_name, strict=True):
 
     :param release_name:
     :type release_name:
-    :return:
-    :rtype:
+    :return: Movie status, None if the lookups failed to determine the type
+    :rtype: bool, None
     """
-    release_name = release_name.lower()
+    release = tokenize(release_name)
 
     # Remove obvious non-movies
-    if any([n in release_name for n in ["hdtv"]]):
+    if release.source == "hdtv" or not release.title:
         return False
 
-    orig_title = parse_release(release_name)
-
-    # Add a year to the name, helps with imdb quite a bit
-    year = find_year(release_name)
-    if year:
-        title = "{0}.{1}".format(orig_title, year)
-        info = rating.imdb_info(title.replace(".", " "))
-    else:
-        info = rating.imdb_info(orig_title.replace(".", " "))
-    if info:
-        try:
-            kind = info['kind']
-        except KeyError:
-            pass
-        else:
-            if kind in ["tv series"]:
-                return False
-            elif kind in ["movie", "video movie"]:
-                return True
-    else:
-        info = rating.tmdb_info(orig_title.replace(".", " "))
-        if info:
-            return True
+    kind = rating.media_kind(release.title, release.year)
+    if kind == "series":
+        return False
+    elif kind == "movie":
+        return True
     app.logger.warning("Skipped release due to inability to determine type: {0}".format(release_name))
-    return False
+    return None
 
 
-def valid_movie(release_name, section_name="section_movies"):
-    """
+def maybe_movie(release_name, section_name="section_movies"):
+    """ Run the movie checks which do not require any metadata lookups. Releases failing
+    this can never match the movie section.
 
     :param release_name:
     :type release_name: unicode
     :param section_name:
     :type section_name: unicode
     :return:
-    :rtype:
+    :rtype: bool
     """
-    if not is_movie(release_name):
-        return False
-    if not valid_year(release_name, section_name=section_name):
+    release = tokenize(release_name)
+    if release.source == "hdtv" or not release.title:
         return False
-    if not valid_score(release_name, section_name=section_name):
+    return valid_year(release_name, section_name=section_name)
+
+
+def valid_movie(release_name, section_name="section_movies"):
+    """
+
+    :param release_name:
+    :type release_name: unicode
+    :param section_name:
+    :type section_name: unicode
+    :return: Movie status, None if a metadata lookup failed before it could be decided
+    :rtype: bool, None
+    """
+    if not maybe_movie(release_name, section_name=section_name):
         return False
+    movie = is_movie(release_name)
+    if not movie:
+        return movie
+    score = valid_score(release_name, section_name=section_name)
+    if not score:
+        return score
     return True
 
 
@@ -176,16 +539,11 @@ def valid_tv(release_name, section_name="section_tv"):
     :rtype:
     """
     quality = find_quality(release_name)
+    tokens = clean_split(release_name.lower())
     for key_type in [quality, "any"]:
-        key = "quality_{0}".format(key_type)
-        if not app.config.has_option(section_name, key):
-            # Ignore undefined sections
-            continue
-        patterns = app.config.build_regex_fetch_list(section_name, key)
-        for pattern in patterns:
-            if match(pattern, release_name, I):
-                section_name = app.config.get_unique_section_name(section_name)
-                return section_name
+        index = get_title_index(section_name, "quality_{0}".format(key_type))
+        if index.find(tokens):
+            return app.config.get_unique_section_name(section_name)
     return False
 
 
@@ -196,20 +554,29 @@ def find_config_section(release_name, prefix="section_"):
     :type release_name: unicode
     :param prefix:
     :type prefix: unicode
-    :return:
-    :rtype: str, bool
+    :return: The section found, False if nothing matched or None if a metadata lookup
+    failed before the release could be matched
+    :rtype: str, bool, None
     """
     if is_ignored(release_name):
         return False
+    undecided = False
     sections = app.config.find_sections(prefix)
     for section in sections:
         if section.lower() == "section_movies":
-            if valid_movie(release_name):
+            try:
+                movie = valid_movie(release_name)
+            except Exception as err:
+                app.logger.exception(err)
+                movie = None
+            if movie:
                 return section
+            elif movie is None:
+                undecided = True
         elif section.lower() == "section_tv":
             if valid_tv(release_name):
                 return section
-    return False
+    return None if undecided else False
 
 
 def is_ignored(release_name, section_name="ignore"):
@@ -225,21 +592,10 @@ def is_ignored(release_name, section_name="ignore"):
     release_name = release_name.lower()
     if any((pattern.search(release_name) for pattern in pattern_season)):
         return True
-    for key in app.config.options(section_name):
-        try:
-            value = app.config.get(section_name, key)
-        except (NoSectionError, NoOptionError):
-            continue
-        if key.startswith("string"):
-            if value.lower() in release_name:
-                app.logger.debug("Matched string ignore pattern {0} {1}".format(key, release_name))
-                return True
-        elif key.startswith("rx"):
-            if match(value, release_name, I):
-                app.logger.debug("Matched regex ignore pattern {0} {1}".format(key, release_name))
-                return True
-        else:
-            app.logger.warning("Invalid ignore configuration key found: {0}".format(key))
+    key = get_ignore_matcher(section_name).match(release_name)
+    if key:
+        app.logger.debug("Matched ignore pattern {0} {1}".format(key, release_name))
+        return True
     return False
 
 
@@ -270,10 +626,7 @@ def find_quality(release_name):
     :return:
     :rtype: unicode
     """
-    if _is_hd(release_name):
-        return "hd"
-    else:
-        return "sd"
+    return tokenize(release_name).quality
 
 
 def find_year(release_name):
@@ -284,16 +637,7 @@ def find_year(release_name):
     :return: Parsed year
     :rtype: int, bool
     """
-    for pattern in pattern_date:
-        p_match = pattern.search(release_name, I)
-        if not p_match:
-            continue
-        values = p_match.groupdict()
-        try:
-            return int(values['year'])
-        except KeyError:
-            pass
-    return False
+    return tokenize(release_name).year or False
 
 
 def parse_release_info(release_name):
@@ -304,30 +648,7 @@ def parse_release_info(release_name):
     :return:
     :rtype:
     """
-    for pattern in pattern_info:
-        p_match = pattern.search(release_name, I)
-        if not p_match:
-            continue
-        values = p_match.groupdict()
-        info = {}
-        value_set = set(values.keys())
-        if value_set == {"year", "month", "day"}:
-            # Daily broadcast
-            info = {
-                'year': values['year'],
-                'month': values['month'].zfill(2),
-                'day': values['day'].zfill(2)
-            }
-        elif value_set == {"season", "episode"}:
-            # Season broadcast
-            info = {
-                'season': int(values['season']),
-                'episode': int(values['episode'])
-            }
-        elif value_set == {"year"}:
-            info = {'year': int(values['year'])}
-        return info
-    return False
+    return tokenize(release_name).info
 
 
 def parse_release(release_name):
@@ -338,27 +659,122 @@ def parse_release(release_name):
     :return: Normalized release name found or False on no match
     :rtype: unicode, bool
     """
-    for pattern in pattern_release:
-        p_match = pattern.search(release_name)
-        if p_match:
-            return normalize(p_match.groupdict()['name'])
+    return tokenize(release_name).title or False
+
+
+def _find_config_section_local(release_name, sections):
+    """ Attempt to find the configuration section of a release using only the checks
+    which do not require metadata lookups.
+
+    :param release_name:
+    :type release_name: unicode
+    :param sections: Section names to check, in config order
+    :type sections: unicode[]
+    :return: The section found, False if nothing can match or None if a metadata
+    lookup is required to decide
+    :rtype: str, bool, None
+    """
+    if is_ignored(release_name):
+        return False
+    for section in sections:
+        if section.lower() == "section_movies":
+            if maybe_movie(release_name):
+                return None
+        elif section.lower() == "section_tv":
+            if valid_tv(release_name):
+                return section
     return False
 
 
+def _check_match_cache():
+    """ Reset the match cache if the config has changed since it was filled, picking up
+    any new cache size and ttl values at the same time.
+    """
+    global _match_cache_revision
+    if _match_cache_revision == app.config.revision:
+        return
+    match_cache.clear()
+    match_cache.max_size = app.config.get_default("general", "match_cache_size", 4096, int)
+    match_cache.ttl = app.config.get_default("general", "match_cache_ttl", 3600, int)
+    _match_cache_revision = app.config.revision
+
+
 def match_release(release_name):
     """ Match a release to a section. Return the section found.
 
+    Decisions, including failed matches, are cached by normalized release name so
+    repeated sightings of a release across feeds and polls skip the metadata lookups.
+    Releases left undecided by a failed lookup use the shorter
+    general.match_cache_negative_ttl so the lookup is retried sooner.
+
     :param release_name:
     :type release_name:
-    :return: Matched release section
-    :rtype: str, bool
+    :return: Matched release section, False if nothing matched or None if a metadata
+    lookup failed before the release could be matched
+    :rtype: str, bool, None
     """
+    _check_match_cache()
+    key = _match_key(release_name)
+    section = match_cache.get(key, _missing)
+    if section is not _missing:
+        return section
     app.logger.debug("Finding Match: {0}".format(release_name))
     section = find_config_section(release_name)
-    if section == "movies":
-        pass
-    elif section == "tv":
-        pass
-    else:
-        pass
+    _cache_match(key, section)
     return section
+
+
+def match_releases(release_names, prefix="section_"):
+    """ Match a batch of releases, such as a whole feed, to their sections.
+
+    Duplicate names are only matched once and the cheap local checks are run on every
+    release before any metadata lookups. The releases still undecided after that are
+    matched concurrently, up to general.match_concurrency at a time.
+
+    :param release_names: Release names to match
+    :type release_names: unicode[]
+    :param prefix:
+    :type prefix: unicode
+    :return: Matched section for each release name, see match_release
+    :rtype: dict
+    """
+    _check_match_cache()
+    sections = app.config.find_sections(prefix)
+    decided = {}
+    pending = OrderedDict()
+    for release_name in release_names:
+        key = _match_key(release_name)
+        if key in decided or key in pending:
+            continue
+        section = match_cache.get(key, _missing)
+        if section is _missing:
+            section = _find_config_section_local(release_name, sections)
+            if section is None:
+                pending[key] = release_name
+                continue
+            _cache_match(key, section)
+        decided[key] = section
+    if pending:
+        app.logger.debug("Looking up {0} releases concurrently".format(len(pending)))
+        pool = Pool(app.config.get_default("general", "match_concurrency", 8, int))
+        found = pool.map(lambda name: find_config_section(name, prefix), pending.values())
+        for key, section in zip(pending.keys(), found):
+            _cache_match(key, section)
+            decided[key] = section
+    return {release_name: decided[_match_key(release_name)] for release_name in release_names}
+
+
+def _match_key(release_name):
+    return ".".join(clean_split(release_name.lower()))
+
+
+def _cache_match(key, section):
+    if section is not None:
+        match_cache.set(key, section)
+        return
+    negative_ttl = app.config.get_default("general", "match_cache_negative_ttl", 900, int)
+    if negative_ttl:
+        match_cache.set(key, None, negative_ttl)
+    else:
+        # A ttl of 0 would keep the undecided match forever, disable caching them instead
+        match_cache.delete(key)
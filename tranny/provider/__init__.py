@@ -6,7 +6,8 @@ just overriding the fetch_releases method.
 from __future__ import unicode_literals
 from time import time
 from tranny.app import config, logger
-from tranny import models, net
+from tranny import datastore, history, models, net, release
+from tranny.inflight import get_registry
 from tranny.extensions import db
 
 
@@ -28,44 +29,133 @@ class TorrentProvider(object):
         # Timestamp of last successful update
         self.enabled = False
         self.last_update = 0
+        # Release keys claimed by download_release during the current poll. Once the torrents
+        # are queued ServiceManager.add releases them, otherwise release_claims does.
+        self.claimed = set()
         self._config_section = config_section
         self.interval = config.get_default(config_section, "interval", 60, int)
+        # Seconds a single poll of the provider may run before being stopped
+        self.timeout = config.get_default(config_section, "timeout",
+                                          config.get_default("general", "provider_timeout", 120, int), int)
 
     @property
     def name(self):
         return self._config_section.split("_")[1]
 
+    @property
+    def config_section(self):
+        return self._config_section
+
     def find_matches(self):
-        """
+        """ Fetch the new releases from the provider. How often this is called is
+        decided by the ServiceManager scheduler using the interval.
 
         :return:
         :rtype:
         """
-        t0 = time()
-        delta = t0 - self.last_update
-        if not delta > self.interval or not self.enabled:
+        if not self.enabled:
             return []
-        self.last_update = t0
+        self.last_update = time()
         return self.fetch_releases()
 
-    def _download_url(self, url):
-        """ Fetch a torrent from the url provided
+    def download_release(self, release_name, release_key, url, section):
+        """ Download the torrent for a release unless another provider is already handling
+        the same release or torrent. The release stays claimed until ServiceManager.add has
+        added it, or is released straight away if the download fails. If the poll stops
+        before its torrents are queued the claim is released by release_claims.
 
-        :param url:
-        :type url:
-        :return:
-        :rtype:
+        :param release_name: Release name
+        :type release_name: unicode
+        :param release_key: Release key, see datastore.generate_release_key
+        :type release_key: unicode
+        :param url: URL of the .torrent file
+        :type url: unicode
+        :param section: Section the release matched
+        :type section: unicode
+        :return: Torrent data, None if the release is already being handled by another
+        provider or False if the download failed
+        :rtype: release.TorrentData, None, bool
         """
-        torrent_data = net.fetch_url(url)
-        return torrent_data
+        registry = get_registry()
+        if not registry.claim(release_key):
+            logger.debug("Skipped release already being downloaded ({0}): {1}".format(release_key, release_name))
+            return None
+        try:
+            # Another provider may have added the release, and released its claim, since
+            # the caller checked the download history
+            if self.skip_existing(release_name) and self.exists(release_key):
+                registry.release(release_key)
+                logger.debug("Skipped release added by another provider ({0}): {1}".format(
+                    release_key, release_name))
+                return None
+            torrent = net.fetch_torrent(url)
+            if not torrent:
+                registry.release(release_key)
+                logger.error("Failed to download torrent data from server: {0}".format(url))
+                return False
+            torrent_data, info_hash = torrent
+            if not registry.claim_hash(release_key, info_hash):
+                registry.release(release_key)
+                logger.debug("Skipped torrent already being downloaded ({0}): {1}".format(info_hash, release_name))
+                return None
+            self.claimed.add(release_key)
+            return release.TorrentData(str(release_name), torrent_data, section)
+        except:
+            # Includes the poll being stopped by its timeout
+            registry.release(release_key)
+            raise
+
+    def release_claims(self):
+        """ Release the claims taken by download_release during a poll which stopped before
+        its torrents were queued, eg: on a timeout, so other providers can fetch them.
+        """
+        registry = get_registry()
+        for release_key in self.claimed:
+            registry.release(release_key)
+        self.claimed.clear()
+
+    @staticmethod
+    def skip_existing(release_name):
+        """ Check if the release should be skipped when it has already been downloaded.
+        With general.fetch_proper enabled only proper releases are downloaded again, as
+        before any release is when it is disabled.
+
+        :param release_name: Release name
+        :type release_name: unicode
+        :return: Skip status
+        :rtype: bool
+        """
+        if config.get_default("general", "fetch_proper", True, bool):
+            return ".proper." not in release_name.lower()
+        return False
 
     def fetch_releases(self):
         raise NotImplementedError("Must override this method")
 
     def exists(self, release_key):
+        if history.index.loaded:
+            return release_key in history.index
         try:
             e = db.session.query(models.DownloadEntity).filter_by(release_key=release_key).all()
         except Exception as err:
             logger.exception(err)
             return False
         return e
+
+    def existing(self, release_keys):
+        """ Find which of the release keys fetched by a poll have already been downloaded
+        using a single lookup, rather than calling exists for each of them. The in memory
+        release index is used once loaded, falling back to querying the database.
+
+        :param release_keys: Release keys to check
+        :type release_keys: unicode[]
+        :return: Release keys already downloaded
+        :rtype: set
+        """
+        if history.index.loaded:
+            return history.index.existing(release_keys)
+        try:
+            return datastore.existing_release_keys(release_keys)
+        except Exception as err:
+            logger.exception(err)
+            return set()
@@ -4,7 +4,7 @@ import socket
 from time import time
 from jsonrpclib import Server
 from jsonrpclib.jsonrpc import ProtocolError
-from tranny import app, parser, provider, datastore, release
+from tranny import app, parser, provider, datastore
 
 _errors = {
     -32001: "Invalid API Key",
@@ -104,30 +104,26 @@ class BroadcastTheNet(provider.TorrentProvider):
         else:
             if scene_only:
                 releases = [rls for rls in releases if rls['Origin'] == "Scene"]
+            sections = parser.match_releases([rls['ReleaseName'] for rls in releases])
+            existing = self.existing(datastore.generate_release_key(rls['ReleaseName']) for rls in releases)
             for entry in releases:
                 release_name = entry['ReleaseName']
                 release_key = datastore.generate_release_key(release_name)
                 if not release_key:
                     continue
-                section = parser.match_release(release_name)
+                section = sections[release_name]
                 if not section:
                     continue
-                if self.exists(release_key):
-                    if app.config.get_default("general", "fetch_proper", True, bool):
-                        if not ".proper." in release_name.lower():
-                            # Skip releases unless they are considered propers
-                            app.logger.debug(
-                                "Skipped previously downloaded release ({0}): {1}".format(
-                                    release_key,
-                                    release_name
-                                )
-                            )
-                            continue
-                dl_url = self.get_torrent_url(entry['TorrentID'])
-                torrent_data = self._download_url(entry['DownloadURL'])
-                if not torrent_data:
-                    app.logger.error("Failed to download torrent data from server: {0}".format(entry['link']))
+                if release_key in existing and self.skip_existing(release_name):
+                    app.logger.debug(
+                        "Skipped previously downloaded release ({0}): {1}".format(
+                            release_key,
+                            release_name
+                        )
+                    )
                     continue
-                data = release.TorrentData(str(release_name), torrent_data, section)
-                found.append(data)
+                dl_url = self.get_torrent_url(entry['TorrentID'])
+                data = self.download_release(release_name, release_key, entry['DownloadURL'], section)
+                if data:
+                    found.append(data)
         return found
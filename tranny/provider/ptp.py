@@ -4,7 +4,7 @@
 """
 from __future__ import unicode_literals, absolute_import
 import requests
-from tranny import provider, app, parser, datastore
+from tranny import provider, app, parser, datastore, net
 from tranny.exceptions import AuthenticationError, ApiError
 
 
@@ -20,7 +20,7 @@ class PTP(provider.TorrentProvider):
         self.enabled = app.config.getboolean(self._config_section, 'enabled')
         self.interval = app.config.get_default(self._config_section, 'interval', self.interval, int)
         self._authenticated = False
-        self.session = requests.Session()
+        self.session = net.new_session()
         app.logger.info("Initialized PTP Provider ({} State)".format(
             'Enabled' if self.enabled else 'Disabled')
         )
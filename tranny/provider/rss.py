@@ -3,8 +3,77 @@
 RSS backend provider functionality
 """
 from __future__ import unicode_literals
-import feedparser
-from tranny import app, provider, parser, datastore, release
+from collections import OrderedDict
+from requests import RequestException
+from tranny import app, provider, parser, datastore, net
+from tranny.diskcache import DiskCache
+from tranny.feed import iter_entries, ParseError
+
+# Persistent per feed state, such as the ETag and Last-Modified values of the last response
+# and the newest entry processed, see get_feed_cache
+_feed_cache = None
+
+
+def get_feed_cache():
+    """ Fetch the cache holding the state of every feed, created on first use so the
+    general.feed_cache_path value of the loaded config is used
+
+    :return: Feed state cache
+    :rtype: DiskCache
+    """
+    global _feed_cache
+    if _feed_cache is None:
+        _feed_cache = DiskCache(app.config.get_default("general", "feed_cache_path", "~/.tranny/feeds.db"),
+                                table="feeds")
+    return _feed_cache
+
+
+class SeenEntries(object):
+    """
+    Persistent set of the ids of the entries already processed for a feed. Once full
+    the oldest ids are evicted first, so it only needs to be larger than the number of
+    entries a feed holds at once.
+    """
+    def __init__(self, cache_key, max_size=1000):
+        """
+        :param cache_key: Feed cache key the ids are stored under
+        :type cache_key: unicode
+        :param max_size: Maximum number of ids to keep
+        :type max_size: int
+        """
+        self.cache_key = cache_key
+        self.max_size = max_size
+        self._ids = OrderedDict.fromkeys(get_feed_cache().get(cache_key, []))
+
+    def __contains__(self, entry_id):
+        return entry_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add_many(self, entry_ids):
+        """ Record the entry ids as processed and persist the index
+
+        :param entry_ids: Entry ids to add
+        :type entry_ids: unicode[]
+        """
+        for entry_id in entry_ids:
+            self._ids.pop(entry_id, None)
+            self._ids[entry_id] = None
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+        get_feed_cache().set(self.cache_key, list(self._ids))
+
+
+def entry_id(entry):
+    """ Fetch the value identifying a feed entry, its guid falling back to its link or title
+
+    :param entry: RSS Feed entry data
+    :type entry: dict
+    :return: Entry id
+    :rtype: unicode
+    """
+    return entry.get('id') or entry.get('link') or entry.get('title')
 
 
 class RSSFeed(provider.TorrentProvider):
@@ -20,6 +89,7 @@ class RSSFeed(provider.TorrentProvider):
         self.url = app.config.get(config_section, "url")
         self.interval = app.config.get_default(config_section, "interval", 60, int)
         self.enabled = app.config.getboolean(config_section, "enabled")
+        self.seen = SeenEntries(self.feed_key("seen"), app.config.get_default(config_section, "seen_size", 1000, int))
         app.logger.debug("Initialized RSS Provider ({} State): {}".format(
             'Enabled' if self.enabled else 'Disabled', self.name)
         )
@@ -34,16 +104,106 @@ class RSSFeed(provider.TorrentProvider):
         :return: a 3 element tuple containing (release_name, torrent_raw_data, section_name)
         :rtype: tranny.release.TorrentData
         """
-        feed = feedparser.parse(self.url)
-        return [self.parse_entry(f) for f in feed.get('entries', {})]
+        feed_cache = get_feed_cache()
+        validators = feed_cache.get(self.feed_key("http"), {})
+        try:
+            with net.open_url(self.url, headers=self.conditional_headers(validators)) as response:
+                if response.status_code == 304:
+                    app.logger.debug("RSS feed unchanged: {0}".format(self.name))
+                    return []
+                response.raise_for_status()
+                entries = self.read_entries(response.raw, feed_cache.get(self.feed_key("last")))
+        except (ParseError, RequestException) as err:
+            app.logger.error("Failed to fetch RSS feed {0}: {1}".format(self.name, err))
+            return []
+        newest_id = entry_id(entries[0]) if entries else None
+        # Entries handled on a previous poll are dropped before doing any work on them
+        entries = [e for e in entries if entry_id(e) not in self.seen]
+        sections = parser.match_releases([e['title'] for e in entries if e.get('title')])
+        existing = self.existing(datastore.generate_release_key(e['title']) for e in entries if e.get('title'))
+        releases = []
+        handled = []
+        for entry in entries:
+            torrent = self.parse_entry(entry, sections, existing)
+            if torrent is not False:
+                # Undecided entries, such as failed downloads or lookups, are left out so
+                # they are retried on the next poll
+                handled.append(entry_id(entry))
+            if torrent:
+                releases.append(torrent)
+        if handled:
+            self.seen.add_many(handled)
+        if len(handled) == len(entries):
+            # Only remember the feed state once every entry is handled, otherwise the next poll
+            # would skip the undecided entries as unchanged
+            if newest_id:
+                feed_cache.set(self.feed_key("last"), newest_id)
+            validators = {key: response.headers.get(header) for key, header in
+                          [('etag', 'ETag'), ('modified', 'Last-Modified')] if response.headers.get(header)}
+            if validators:
+                feed_cache.set(self.feed_key("http"), validators)
+        return releases
+
+    def feed_key(self, kind):
+        """ Build the feed cache key used to store state of the kind provided for this feed
+
+        :param kind: Kind of state stored
+        :type kind: unicode
+        :return: Cache key
+        :rtype: unicode
+        """
+        return "{0}:{1}".format(kind, self.url)
 
-    def parse_entry(self, entry):
+    @staticmethod
+    def conditional_headers(validators):
+        """ Build the request headers sending the ETag and Last-Modified values of the
+        previous response, so an unchanged feed is answered with a bodiless 304 response
+
+        :param validators: dict of the etag and modified values of the previous response
+        :type validators: dict
+        :return: Request headers
+        :rtype: dict
+        """
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('modified'):
+            headers['If-Modified-Since'] = validators['modified']
+        return headers
+
+    @staticmethod
+    def read_entries(source, last_id=None):
+        """ Read the feed entries, newest first, up to the newest entry processed by the
+        previous poll. The rest of the feed is not read or parsed.
+
+        :param source: File like object containing the feed
+        :type source: file
+        :param last_id: Id of the newest entry processed by the previous poll
+        :type last_id: unicode
+        :return: Entries newer than last_id
+        :rtype: dict[]
+        """
+        entries = []
+        for entry in iter_entries(source):
+            if last_id and entry_id(entry) == last_id:
+                break
+            entries.append(entry)
+        return entries
+
+    def parse_entry(self, entry, sections=None, existing=None):
         """ Parse RSS entry data for qualified torrents to download
 
         :param entry: RSS Feed entry data
         :type entry: dict
-        :return: A parsed release object ready to load into backend client or None on fail
-        :rtype: release.TorrentData, None
+        :param sections: Sections already matched for the feed by parser.match_releases
+        :type sections: dict
+        :param existing: Release keys of the feed already downloaded, see TorrentProvider.existing.
+        When not provided the release is looked up on its own.
+        :type existing: set
+        :return: A parsed release object ready to load into backend client, None if the entry
+        is not wanted or False if it could not be decided yet, eg: the torrent could not be
+        downloaded or the metadata lookups matching it failed
+        :rtype: release.TorrentData, None, bool
         """
         try:
             release_name = entry.get('title', None)
@@ -55,23 +215,28 @@ class RSSFeed(provider.TorrentProvider):
         release_key = datastore.generate_release_key(release_name)
         if not release_key:
             return None
+        url = entry.get('link')
+        if not url:
+            app.logger.warning("No link parsed from RSS feed entry: {0}".format(release_name))
+            return None
 
-        section = parser.match_release(release_name)
+        if sections and release_name in sections:
+            section = sections[release_name]
+        else:
+            section = parser.match_release(release_name)
         if section:
-            if self.exists(release_key):
-                if app.config.get_default("general", "fetch_proper", True, bool):
-                    if not ".proper." in release_name.lower():
-                        # Skip releases unless they are considered proper's
-                        app.logger.debug(
-                            "Skipped previously downloaded release ({0}): {1}".format(
-                                release_key,
-                                release_name
-                            )
+            if self.skip_existing(release_name):
+                if release_key in existing if existing is not None else self.exists(release_key):
+                    app.logger.debug(
+                        "Skipped previously downloaded release ({0}): {1}".format(
+                            release_key,
+                            release_name
                         )
-                        return None
-            torrent_data = self._download_url(entry['link'])
-            if not torrent_data:
-                app.logger.error("Failed to download torrent data from server: {0}".format(entry['link']))
-                return None
-            data = release.TorrentData(str(release_name), torrent_data, section)
-            return data
+                    )
+                    return None
+            # Releases claimed by another provider are checked again once that download is done
+            return self.download_release(release_name, release_key, url, section) or False
+        if section is None:
+            # A metadata lookup failed before the release could be matched
+            return False
+        return None
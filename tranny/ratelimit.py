@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Token bucket rate limiting shared by everything talking to the same external service.
+Callers over the limit are queued until a token is available instead of failing, and
+the rate is reduced while the service signals it is being throttled.
+"""
+from __future__ import unicode_literals
+from time import time
+from gevent import sleep
+from gevent.lock import Semaphore
+from tranny import app
+
+# Default requests per second and burst size used when a service section does not
+# define rate_limit/rate_burst
+_defaults = {
+    "themoviedb": (4.0, 10),
+    "imdb": (2.0, 4)
+}
+
+_limiters = {}
+
+
+class RateLimiter(object):
+    """
+    Token bucket holding up to burst tokens, refilled at rate tokens per second. Each
+    request takes a token, waiting in FIFO order for one to become available.
+
+    When the service reports throttling the refill rate is halved and all requests are
+    held back for the Retry-After period, or an exponentially increasing backoff. Each
+    successful request afterwards restores part of the rate until the configured
+    maximum is reached again.
+    """
+    def __init__(self, rate, burst=1, max_backoff=300, name=None):
+        """
+        :param rate: Maximum sustained requests per second
+        :type rate: float
+        :param burst: Maximum number of requests allowed at once after being idle
+        :type burst: int
+        :param max_backoff: Maximum seconds to hold back requests after throttling
+        :type max_backoff: int
+        :param name: Service name used when logging throttling
+        :type name: unicode
+        """
+        self.rate = float(rate)
+        self.current_rate = self.rate
+        self.burst = max(1, burst)
+        self.max_backoff = max_backoff
+        self.name = name or "unknown"
+        self.tokens = float(self.burst)
+        self.updated = time()
+        self.backoff = 0
+        self.blocked_until = 0
+        self.waiting = 0
+        self.throttle_count = 0
+        self._queue = Semaphore()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.current_rate)
+        self.updated = now
+
+    def acquire(self):
+        """ Block the calling greenlet until a request is allowed """
+        self.waiting += 1
+        try:
+            with self._queue:
+                while True:
+                    now = time()
+                    if now < self.blocked_until:
+                        sleep(self.blocked_until - now)
+                        continue
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    sleep((1 - self.tokens) / self.current_rate)
+        finally:
+            self.waiting -= 1
+
+    def throttled(self, retry_after=None):
+        """ Record that the service rejected a request for being over its limit
+
+        :param retry_after: Seconds the service asked us to wait, if provided
+        :type retry_after: float
+        """
+        self.throttle_count += 1
+        self.backoff = min(self.max_backoff, self.backoff * 2 if self.backoff else 1)
+        delay = min(self.max_backoff, retry_after) if retry_after else self.backoff
+        self.blocked_until = max(self.blocked_until, time() + delay)
+        self.updated = self.blocked_until
+        self.current_rate = max(self.rate / 10, self.current_rate / 2)
+        self.tokens = 0
+        app.logger.warning("Throttled by {0}, holding back {1} queued requests for {2:.1f}s at {3:.2f}/s".format(
+            self.name, self.waiting, delay, self.current_rate))
+
+    def succeeded(self):
+        """ Record a successful request, recovering the rate after throttling """
+        self.backoff = 0
+        if self.current_rate < self.rate:
+            self.current_rate = min(self.rate, self.current_rate + self.rate / 10)
+
+    def queue_depth(self):
+        """ Number of callers currently waiting for a token
+
+        :rtype: int
+        """
+        return self.waiting
+
+    def stats(self):
+        """ Fetch the current limiter state
+
+        :return: dict of rate, current_rate, queue_depth and throttled counts
+        :rtype: dict
+        """
+        return {
+            'rate': self.rate,
+            'current_rate': self.current_rate,
+            'queue_depth': self.waiting,
+            'throttled': self.throttle_count
+        }
+
+
+def get_limiter(service_name):
+    """ Fetch the limiter shared by all requests to a service. The rate is read from
+    the rate_limit and rate_burst options in the services config section.
+
+    :param service_name: Config section name of the service
+    :type service_name: unicode
+    :return: Limiter for the service
+    :rtype: RateLimiter
+    """
+    try:
+        return _limiters[service_name]
+    except KeyError:
+        rate, burst = _defaults.get(service_name, (1.0, 1))
+        limiter = RateLimiter(
+            app.config.get_default(service_name, "rate_limit", rate, float),
+            app.config.get_default(service_name, "rate_burst", burst, int),
+            name=service_name
+        )
+        _limiters[service_name] = limiter
+        return limiter
+
+
+def parse_retry_after(value):
+    """ Parse a Retry-After header value. Only the delay in seconds form is supported.
+
+    :param value: Header value
+    :type value: unicode
+    :return: Seconds to wait or None if not provided or not understood
+    :rtype: float, None
+    """
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def stats():
+    """ Fetch the state of every limiter in use
+
+    :return: dict of service name to limiter stats
+    :rtype: dict
+    """
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
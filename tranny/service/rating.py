@@ -8,13 +8,41 @@ try:
     import configparser  # py3
 except ImportError:
     import ConfigParser as configparser
-from tranny import app
+import sqlite3
+from time import time
+from gevent import iwait
+from gevent.event import AsyncResult
+from gevent.pool import Pool
+from tranny import app, ratelimit
+from tranny.diskcache import DiskCache
+from tranny.titledb import get_title_db
 
 # Config section names
 _tmdb_section = "themoviedb"
 _imdb_section = "imdb"
 
-_imdb_cache = {}
+# Persistent cache of lookup results shared by all services, keyed by service:title. Created
+# on first use, see _get_metadata_cache
+_metadata_cache = None
+
+# Marks a cache miss, as None is a valid cached lookup result
+_missing = object()
+
+# imdb kind values mapped to the media kinds returned by media_kind
+_imdb_kinds = {
+    "tv series": "series",
+    "tv mini series": "series",
+    "movie": "movie",
+    "tv movie": "movie",
+    "video movie": "movie"
+}
+
+# Lookups currently in progress keyed by cache key, shared with concurrent callers
+_in_flight = {}
+
+# Greenlet pool shared by all metadata lookups, bounding how many run at once. Created on
+# first use, see _get_lookup_pool
+_lookup_pool = None
 
 # Try and load imdb
 try:
@@ -33,9 +61,158 @@ except (ImportError, configparser.Error):
     tmdb, _tmdb_enabled = False, False
 
 
+def _imdb_active():
+    if not (imdb and _imdb_enabled):
+        return False
+    try:
+        return app.config.getboolean(_imdb_section, "enabled")
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        # IMDB needs no account, so it is used unless disabled
+        return True
+
+
+def _tmdb_active():
+    if not (tmdb and _tmdb_enabled):
+        return False
+    try:
+        return app.config.getboolean(_tmdb_section, "enabled")
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        # themoviedb requests fail without the api_key of a themoviedb section, so it is
+        # only used once enabled there
+        return False
+
+
+def _get_metadata_cache():
+    """ Fetch the metadata cache, creating it on first use so the values of the loaded
+    config are used rather than the defaults in effect at import time
+
+    :rtype: DiskCache
+    """
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = DiskCache(
+            app.config.get_default("general", "metadata_cache_path", "~/.tranny/metadata.db"),
+            table="metadata",
+            ttl=app.config.get_default("general", "metadata_cache_ttl", 604800, int),
+            negative_ttl=app.config.get_default("general", "metadata_cache_negative_ttl", 86400, int),
+            max_size=app.config.get_default("general", "metadata_cache_size", 50000, int)
+        )
+    return _metadata_cache
+
+
+def _get_lookup_pool():
+    """ Fetch the lookup pool, creating it on first use with general.lookup_concurrency
+
+    :rtype: gevent.pool.Pool
+    """
+    global _lookup_pool
+    if _lookup_pool is None:
+        _lookup_pool = Pool(app.config.get_default("general", "lookup_concurrency", 10, int))
+    return _lookup_pool
+
+
+def _lookup_timeout():
+    return app.config.get_default("general", "lookup_timeout", 10, float)
+
+
+def _spawn_lookup(deadline, fetch, *args, **kwargs):
+    """ Start a lookup in the shared lookup pool. When the pool is full, wait for a free
+    slot no longer than the deadline of the caller.
+
+    :param deadline: Time by which the caller stops waiting for the lookup
+    :type deadline: float
+    :param fetch: Function performing the lookup
+    :type fetch: callable
+    :return: Greenlet running the lookup or None if no slot became free in time
+    :rtype: gevent.Greenlet, None
+    """
+    pool = _get_lookup_pool()
+    if not pool.wait_available(timeout=max(0, deadline - time())):
+        app.logger.warning("Skipped {0} lookup, no free lookup slot".format(fetch.__name__))
+        return None
+    return pool.spawn(fetch, *args, **kwargs)
+
+
+def _normalize_title(title):
+    """ Normalize a title so the dotted form of release names, eg: Easy.Money, and the
+    spaced form, eg: easy money, are looked up and cached as the same title
+
+    :param title: Media title
+    :type title: unicode
+    :return: Lower cased title with words separated by single spaces
+    :rtype: unicode
+    """
+    return " ".join(title.lower().replace(".", " ").split())
+
+
+def _lookup_key(service, title):
+    """ Build the key used to cache and coalesce lookups of a title, see _normalize_title
+
+    :param service: Name of the service or lookup type
+    :type service: unicode
+    :param title: Media title to lookup
+    :type title: unicode
+    :return: Lookup key
+    :rtype: unicode
+    """
+    return "{0}:{1}".format(service, _normalize_title(title))
+
+
+def _single_flight(key, fetch, *args):
+    """ Call fetch unless a lookup for the same key is already running, in which
+    case wait for that lookup to finish and share its result or exception instead
+    of issuing a duplicate request.
+
+    :param key: Lookup key, see _lookup_key
+    :type key: unicode
+    :param fetch: Function performing the lookup
+    :type fetch: callable
+    :return: Result of the lookup
+    """
+    pending = _in_flight.get(key)
+    if pending is not None:
+        return pending.get()
+    pending = _in_flight[key] = AsyncResult()
+    try:
+        value = fetch(*args)
+    except Exception as err:
+        pending.set_exception(err)
+        raise
+    else:
+        pending.set(value)
+        return value
+    finally:
+        del _in_flight[key]
+
+
+def local_info(title, year=None):
+    """ Lookup the title in the local database imported from the IMDb dataset dumps. Titles
+    without an exact match are matched to a similar title when imdb.title_db_fuzzy_ratio is set.
+
+    :param title: Media title to lookup
+    :type title: unicode
+    :param year: Release year
+    :type year: int
+    :return: Info about the title in the same format as imdb_info, None if not found
+    or the database has not been imported
+    :rtype: dict, None
+    """
+    title = _normalize_title(title)
+    min_ratio = app.config.get_default(_imdb_section, "title_db_fuzzy_ratio", 90, int)
+    try:
+        if min_ratio:
+            return get_title_db().fuzzy_lookup(title, year, min_ratio)
+        return get_title_db().lookup(title, year)
+    except sqlite3.Error as err:
+        app.logger.warning("Failed to lookup {0} in local title database: {1}".format(title, err))
+        return None
+
+
 def score(title, min_votes=0, precision=1):
     """ Fetch a average score based on the enabled and installed movie/tv info
-    database modules.
+    database modules. Titles found in the local title database are scored from it without
+    any network lookups. Otherwise the services are queried concurrently and any not
+    answering within the general.lookup_timeout deadline are left out of the average.
 
     :param title: Media title to lookup
     :type title: unicode
@@ -43,43 +220,137 @@ def score(title, min_votes=0, precision=1):
     :type min_votes: int
     :param precision: set the score precision returned
     :type precision: int
-    :return: Average score across all enabled backend services
-    :rtype: float
+    :return: Average score across all enabled backend services, None if none of them answered
+    :rtype: float, None
+    """
+    title = _normalize_title(title)
+    cache_key = "{0}:{1}".format(_lookup_key("score", title), min_votes)
+    found_score = _get_metadata_cache().get(cache_key, _missing)
+    if found_score is not _missing:
+        return round(found_score, precision)
+    info = local_info(title)
+    if info and info['rating'] is not None:
+        if min_votes and info['votes'] < min_votes:
+            return 0
+        return round(info['rating'], precision)
+    deadline = time() + _lookup_timeout()
+    services = []
+    if _imdb_active():
+        services.append(_imdb_score)
+    if _tmdb_active():
+        services.append(_tmdb_score)
+    lookups = [_spawn_lookup(deadline, fetch, title, min_votes=min_votes) for fetch in services]
+    done = list(iwait([lookup for lookup in lookups if lookup], timeout=max(0, deadline - time())))
+    scores = [lookup.value for lookup in done if lookup.successful()]
+    if services and not scores:
+        app.logger.warning("Failed to lookup a score for {0}".format(title))
+        return None
+    found_score = sum(scores) / float(len(scores)) if scores else 0
+    if len(scores) == len(services):
+        # Only cache complete results, a partial average would stick around after a slow lookup
+        _get_metadata_cache().set(cache_key, found_score)
+    return round(found_score, precision)
+
+
+def media_kind(title, year=None):
+    """ Determine if a title is a movie or a tv series. The local title database is
+    checked first, then IMDB and themoviedb are queried concurrently. themoviedb only
+    searches movies, so its answer is only used once IMDB has failed or found nothing.
+    Lookups still running after the general.lookup_timeout deadline are not waited on.
+
+    :param title: Media title to lookup
+    :type title: unicode
+    :param year: Release year, used to narrow the IMDB search
+    :type year: int
+    :return: movie, series or None if it could not be determined
+    :rtype: unicode, None
     """
-    scores = []
-    if imdb and _imdb_enabled and app.config.getboolean("imdb", "enabled"):
-        scores.append(_imdb_score(title, min_votes=min_votes))
-    if tmdb and _tmdb_enabled and app.config.getboolean("themoviedb", "enabled"):
-        scores.append(_tmdb_score(title, min_votes=min_votes))
-    if not scores:
-        return 0
-    return round(sum(scores) / float(len(scores)), precision)
+    title = _normalize_title(title)
+    info = local_info(title, year)
+    if info and info['kind'] in _imdb_kinds:
+        return _imdb_kinds[info['kind']]
+    deadline = time() + _lookup_timeout()
+    lookups = {}
+    if _imdb_active():
+        imdb_title = "{0} {1}".format(title, year) if year else title
+        # The local title database was already checked above
+        lookups[_spawn_lookup(deadline, imdb_info, imdb_title, local=False)] = "imdb"
+    if _tmdb_active():
+        lookups[_spawn_lookup(deadline, tmdb_info, title)] = "tmdb"
+    lookups.pop(None, None)
+    imdb_pending = "imdb" in lookups.values()
+    tmdb_found = False
+    for lookup in iwait(lookups.keys(), timeout=max(0, deadline - time())):
+        service = lookups[lookup]
+        if not lookup.successful():
+            app.logger.warning("Failed to lookup {0} info for {1}: {2}".format(service, title, lookup.exception))
+        elif service == "tmdb":
+            tmdb_found = bool(lookup.value)
+        elif lookup.value and lookup.value.get('kind') in _imdb_kinds:
+            return _imdb_kinds[lookup.value['kind']]
+        if service == "imdb":
+            imdb_pending = False
+        if tmdb_found and not imdb_pending:
+            return "movie"
+    # IMDB missed the deadline
+    return "movie" if tmdb_found else None
 
 
-def imdb_info(title):
+def imdb_info(title, local=True):
     """ Search IMDB for the title provided. Return the 1st match returned making
-    the assumption its accurate
+    the assumption its accurate. The local title database is used when it has the title.
 
     :param title: Name of the show/movie to lookup
     :type title: unicode
+    :param local: Check the local title database before searching IMDB
+    :type local: bool
     :return: Info about the title
     :rtype: dict
     """
+    title = _normalize_title(title)
+    if local:
+        info = local_info(title)
+        if info:
+            return info
+    cache_key = _lookup_key("imdb", title)
+    info = _get_metadata_cache().get(cache_key, _missing)
+    if info is not _missing:
+        return info
+    return _single_flight(cache_key, _fetch_imdb_info, cache_key, title)
+
+
+def _imdb_request(fetch, *args, **kwargs):
+    """ Run an IMDB request once the imdb rate limiter allows it. Failed requests
+    make the limiter back off, as IMDB gives no specific signal when throttling.
+
+    :param fetch: IMDb method performing the request
+    :type fetch: callable
+    :return: Result of the request
+    """
+    limiter = ratelimit.get_limiter(_imdb_section)
+    limiter.acquire()
     try:
-        if title in _imdb_cache:
-            return _imdb_cache[title]
-    except KeyError:
-        pass
-    i = imdb.IMDb()
-    search_result = i.search_movie(title, results=1)
-    if not search_result:
-        return None
-    result = search_result[0]
-    i.update(result)
-    _imdb_cache[title] = result
+        result = fetch(*args, **kwargs)
+    except imdb.IMDbError:
+        limiter.throttled()
+        raise
+    limiter.succeeded()
     return result
 
 
+def _fetch_imdb_info(cache_key, title):
+    i = imdb.IMDb()
+    search_result = _imdb_request(i.search_movie, title, results=1)
+    if search_result:
+        result = search_result[0]
+        _imdb_request(i.update, result)
+        info = {key: result.get(key) for key in ['title', 'year', 'kind', 'rating', 'votes']}
+    else:
+        info = None
+    _get_metadata_cache().set(cache_key, info)
+    return info
+
+
 def _imdb_score(title, min_votes=0):
     """ Get the IMDB score for the title provided. If the minimum number of votes
     is greater than 0 and the vote count is less than that number, 0 will be returned
@@ -93,9 +364,9 @@ def _imdb_score(title, min_votes=0):
     """
     info = imdb_info(title)
     if info:
-        if min_votes and info['votes'] < min_votes:
+        if min_votes and (info['votes'] or 0) < min_votes:
             return 0
-        return info['rating']
+        return info['rating'] or 0
     return 0
 
 
@@ -108,11 +379,21 @@ def tmdb_info(title):
     :return: Info about the title
     :rtype: dict
     """
+    title = _normalize_title(title)
+    cache_key = _lookup_key("tmdb", title)
+    result = _get_metadata_cache().get(cache_key, _missing)
+    if result is not _missing:
+        return result
+    return _single_flight(cache_key, _fetch_tmdb_info, cache_key, title)
+
+
+def _fetch_tmdb_info(cache_key, title):
     result = False
     search_result = tmdb.Movies(title, limit=True)
     for movie in search_result.iter_results():
         result = movie
         break
+    _get_metadata_cache().set(cache_key, result)
     return result
 
 
@@ -14,11 +14,29 @@ try:
 except:
     import json as simplejson
 
+import time
 import fuzzywuzzy.fuzz
 import requests
+from gevent.pool import Pool
+from requests.adapters import HTTPAdapter
+from tranny import ratelimit
 
 cfg = {}
 
+# Seconds the /configuration response is reused before being fetched again
+CONFIG_TTL = 86400
+
+# Number of search result pages requested concurrently when all results are needed
+PREFETCH_PAGES = 4
+
+# Attempts made for a request the API rejects with 429 or a server error before giving up
+MAX_ATTEMPTS = 4
+
+# Shared keep-alive session so lookups reuse pooled connections to the API
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
+session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
+
 def configure(api_key, language='en'):
     cfg['apikey'] = api_key
     cfg['language'] = language
@@ -46,12 +64,24 @@ def configure(api_key, language='en'):
     cfg['api']['poster.sizes'] = ""
     cfg['api']['profile.sizes'] = ""
     cfg['api']['session.id'] = ""
+    cfg['api']['updated'] = 0
 
 
 class Core(object):
     def getJSON(self, url, language=None):
         language = language or cfg['language']
-        page = requests.get(url, params={'language': language}).content
+        limiter = ratelimit.get_limiter("themoviedb")
+        for attempt in range(MAX_ATTEMPTS):
+            limiter.acquire()
+            response = session.get(url, params={'language': language})
+            if response.status_code != 429 and response.status_code < 500:
+                limiter.succeeded()
+                break
+            limiter.throttled(ratelimit.parse_retry_after(response.headers.get('Retry-After')))
+        else:
+            # Still throttled or failing after every attempt, don't parse the error page
+            response.raise_for_status()
+        page = response.content
         try:
             return simplejson.loads(page)
         except:
@@ -63,11 +93,14 @@ class Core(object):
         return False
 
     def update_configuration(self):
+        if cfg['api']['updated'] + CONFIG_TTL > time.time():
+            return "ok"
         c = self.getJSON(cfg['urls']['config'])
         cfg['api']['backdrop.sizes'] = c['images']['backdrop_sizes']
         cfg['api']['base.url'] = c['images']['base_url']
         cfg['api']['poster.sizes'] = c['images']['poster_sizes']
         cfg['api']['profile.sizes'] = c['images']['profile_sizes']
+        cfg['api']['updated'] = time.time()
         return "ok"
 
     def backdrop_sizes(self,img_size):
@@ -95,18 +128,41 @@ class Core(object):
 class Movies(Core):
     def __init__(self, title="", limit=False, language=None):
         self.limit = limit
+        self.language = language
         self.update_configuration()
         self.searched = title
-        title = self.escape(title)
-        self.movies = self.getJSON(cfg['urls']['movie.search'] % (title,str(1)), language=language)
-        pages = self.movies["total_pages"]
-        if not self.limit:
-            if int(pages) > 1:                  #
-                for i in range(2,int(pages)+1): #  Thanks @tBuLi
-                    self.movies["results"].extend(self.getJSON(cfg['urls']['movie.search'] % (title,str(i)), language=language)["results"])
+        self.title = self.escape(title)
+        self.movies = self.get_page(1)
+        self.pages = {1: self.movies}
+
+    def get_page(self, page):
+        return self.getJSON(cfg['urls']['movie.search'] % (self.title,str(page)), language=self.language)
+
+    def iter_pages(self, prefetch=0):
+        """
+        Yield each page of search results, only requesting a page once the previous
+        one has been consumed. With prefetch set, up to that many of the following
+        pages are requested concurrently ahead of the caller. Only the first page
+        is used when limit is set.
+        """
+        yield self.movies
+        if self.limit:
+            return
+        remaining = range(2, int(self.movies["total_pages"]) + 1)
+        if prefetch:
+            fetched = Pool(prefetch).imap(self._fetch_page, remaining)
+        else:
+            fetched = (self._fetch_page(i) for i in remaining)
+        for page in fetched:
+            yield page
+
+    def _fetch_page(self, page):
+        if page not in self.pages:
+            self.pages[page] = self.get_page(page)
+        return self.pages[page]
 
     def __iter__(self):
-        for i in self.movies["results"]:
+        for i in self.iter_results():
             yield Movie(i["id"])
 
     def get_total_results(self):
@@ -114,9 +170,10 @@ class Movies(Core):
             return len(self.movies["results"])
         return self.movies["total_results"]
 
-    def iter_results(self):
-        for i in self.movies["results"]:
-            yield i
+    def iter_results(self, prefetch=0):
+        for page in self.iter_pages(prefetch):
+            for i in page["results"]:
+                yield i
 
     def get_ordered_matches(self):
         """
@@ -126,7 +183,7 @@ class Movies(Core):
         Ordered, descending, by the percentage similarity.
         """
         our_results = []
-        for movie in self.iter_results():
+        for movie in self.iter_results(prefetch=PREFETCH_PAGES):
             ratio = fuzzywuzzy.fuzz.ratio(self.searched, movie['title'])
             our_results.append((ratio, movie))
         return sorted(our_results, reverse=True)
@@ -262,7 +319,7 @@ class Movie(Core):
                 return "PROBLEM_AUTH"
             sess_id = cfg["api"]["session.id"]
             data = {"value":float(value)}
-            req = requests.post(cfg['urls']['movie.add.rating'] % (self.movie_id,sess_id),data=data)
+            req = session.post(cfg['urls']['movie.add.rating'] % (self.movie_id,sess_id),data=data)
             res = simplejson.loads(bytes(req.content).decode())
             if res['status_message'] == "Success":
                 return True
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """
-Functions used to retrieve statistics from historical data.
+Functions used to retrieve statistics from historical data. The totals are counted by the
+database so the download history is never loaded.
 """
 from __future__ import unicode_literals
 from collections import Counter
@@ -12,42 +13,43 @@ class PieChart(Counter):
         return [{'label': section, "data": total} for section, total in self.most_common()]
 
 
-def service_totals(records):
+def service_totals():
     """ Get the download totals for each provider registered in the database
 
-    :param records: list of history records
-    :type records: tranny.models.DownloadEntity[]
     :return: Dict with totals for each key corresponding to a providers name
     :rtype: dict[]
     """
-    return PieChart(datastore.get_source(source_id=r.source_id).source_name for r in records).graph_data()
+    return PieChart(dict(datastore.count_downloads_by_source())).graph_data()
 
 
-def section_totals(records):
-    data_set = (datastore.get_section(section_id=r.section_id).section_name.split("_")[1] for r in records)
-    return PieChart(data_set).graph_data()
+def section_totals():
+    """ Get the download totals for each section registered in the database
 
-
-def service_type_totals(records):
+    :return: Dict with totals for each key corresponding to a sections name
+    :rtype: dict[]
     """
+    counter = PieChart()
+    for section_name, total in datastore.count_downloads_by_section():
+        counter[section_name.split("_")[1]] += total
+    return counter.graph_data()
 
-    :param records:
-    :type records: tranny.models.DownloadEntity[]
-    :return:
-    :rtype:
+
+def service_type_totals():
+    """ Get the download totals for each type of provider, RSS feeds being counted together
+
+    :return: Dict with totals for each provider type
+    :rtype: dict[]
     """
     rss_feeds = [name.split("_")[1] for name in app.config.find_sections("rss_")]
     services = [name.split("_")[1] for name in app.config.find_sections("service_")]
     counter = PieChart()
-    for record in records:
-        # TODO fix with joined value
-        source_name = datastore.get_source(source_id=record.source_id).source_name
+    for source_name, total in datastore.count_downloads_by_source():
         if source_name in rss_feeds:
-            counter['RSS'] += 1
+            counter['RSS'] += total
         elif source_name in services:
-            counter["{0} (api)".format(source_name)] += 1
+            counter["{0} (api)".format(source_name)] += total
         elif source_name == "watch":
-            counter["Watch"] += 1
+            counter["Watch"] += total
         else:
-            counter['Unknown'] += 1
+            counter['Unknown'] += total
     return counter.graph_data()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Local title database built from the public IMDb dataset dumps, allowing titles to be
+classified and scored without a network round trip.
+
+The dumps are available from https://datasets.imdbws.com/ and can be imported with:
+
+    ./manage.py import_imdb -b title.basics.tsv.gz -r title.ratings.tsv.gz
+"""
+from __future__ import unicode_literals
+import codecs
+import gzip
+import io
+import sqlite3
+from os import rename, remove
+from os.path import expanduser, dirname, exists
+from re import compile, U
+from tranny import app
+from tranny.configuration import mkdirp
+from tranny.trigram import TrigramIndex, StoredTrigramIndex
+
+# IMDb dataset titleType values imported, mapped to the kind names used by the IMDb
+# web service so results can be used in place of each other
+title_kinds = {
+    "movie": "movie",
+    "tvMovie": "tv movie",
+    "video": "video movie",
+    "tvSeries": "tv series",
+    "tvMiniSeries": "tv mini series"
+}
+
+# Number of rows inserted per statement while importing
+_batch_size = 10000
+
+_apostrophes = compile(r"['`’]", U)
+_separators = compile(r"[\W_]+", U)
+
+_title_dbs = {}
+
+
+def normalize_title(title):
+    """ Normalize a title for lookups so release names and IMDb titles compare equal,
+    eg: The.Lord.of.the.Rings -> the lord of the rings
+
+    :param title: Title to normalize
+    :type title: unicode
+    :return: Normalized title
+    :rtype: unicode
+    """
+    return _separators.sub(" ", _apostrophes.sub("", title.lower())).strip()
+
+
+def _read_tsv(path):
+    """ Read the rows of a IMDb dataset file, which may be gzip compressed. The header
+    row is skipped and \\N values are returned as None.
+
+    :param path: Path of the .tsv or .tsv.gz file
+    :type path: unicode
+    :return: Generator of column lists
+    :rtype: generator
+    """
+    if path.endswith(".gz"):
+        tsv_file = codecs.getreader("utf-8")(gzip.open(path, "rb"))
+    else:
+        tsv_file = io.open(path, encoding="utf-8")
+    with tsv_file:
+        next(tsv_file, None)
+        for line in tsv_file:
+            yield [None if value == "\\N" else value for value in line.rstrip("\n").split("\t")]
+
+
+class TitleDB(object):
+    """
+    SQLite database of normalized title, year, kind, rating and vote count. Titles are
+    indexed along with the year so a lookup is a single index probe.
+    """
+    def __init__(self, path):
+        """
+        :param path: Path of the SQLite database file
+        :type path: unicode
+        """
+        self.path = expanduser(path)
+        self._db = None
+        self._index = None
+
+    def available(self):
+        """ Check if the database has been imported
+
+        :rtype: bool
+        """
+        return self._db is not None or exists(self.path)
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        self._index = None
+
+    def lookup(self, title, year=None):
+        """ Find the most voted title matching the title provided. When a year is given
+        titles released a year either side of it also match, as release years differ
+        between regions.
+
+        :param title: Title to lookup
+        :type title: unicode
+        :param year: Release year
+        :type year: int
+        :return: dict of title, year, kind, rating and votes or None if not found
+        :rtype: dict, None
+        """
+        if not self.available():
+            return None
+        query = "SELECT title, year, kind, rating, votes FROM titles WHERE title = ?"
+        args = [normalize_title(title)]
+        if year:
+            query += " AND year BETWEEN ? AND ?"
+            args += [int(year) - 1, int(year) + 1]
+        query += " ORDER BY votes DESC LIMIT 1"
+        row = self._connect().execute(query, args).fetchone()
+        if not row:
+            return None
+        return dict(zip(['title', 'year', 'kind', 'rating', 'votes'], row))
+
+    def _trigram_index(self):
+        """ Open the trigram index stored by import_dumps
+
+        :return: Trigram index or None if the database was imported without one
+        :rtype: StoredTrigramIndex, None
+        """
+        if self._index is None:
+            db = self._connect()
+            if not StoredTrigramIndex.exists(db):
+                app.logger.warning("Local title database has no trigram index, import it again to enable "
+                                   "fuzzy matching: {0}".format(self.path))
+                self._index = False
+            else:
+                self._index = StoredTrigramIndex(db)
+        return self._index or None
+
+    def fuzzy_lookup(self, title, year=None, min_ratio=90):
+        """ Lookup a title, falling back to the closest matching titles when there is no
+        exact match. The closest titles are found with the trigram index stored when the
+        database was imported.
+
+        :param title: Title to lookup
+        :type title: unicode
+        :param year: Release year
+        :type year: int
+        :param min_ratio: Minimum fuzzy ratio, 0-100, of a close match
+        :type min_ratio: int
+        :return: dict of title, year, kind, rating and votes or None if not found
+        :rtype: dict, None
+        """
+        info = self.lookup(title, year)
+        if info or not self.available():
+            return info
+        index = self._trigram_index()
+        if index is None:
+            return None
+        for ratio, match in index.search(normalize_title(title), limit=3, min_ratio=min_ratio):
+            info = self.lookup(match, year)
+            if info:
+                return info
+        return None
+
+    def import_dumps(self, basics_path, ratings_path):
+        """ Build the database from the title.basics and title.ratings dataset dumps,
+        replacing any existing database once the import is complete. Both the primary
+        and original titles are indexed, and the trigram index used by fuzzy_lookup is
+        built and stored along with them.
+
+        :param basics_path: Path to title.basics.tsv(.gz)
+        :type basics_path: unicode
+        :param ratings_path: Path to title.ratings.tsv(.gz)
+        :type ratings_path: unicode
+        :return: Number of titles imported
+        :rtype: int
+        """
+        ratings = {}
+        for tconst, average_rating, num_votes in _read_tsv(ratings_path):
+            ratings[tconst] = (float(average_rating), int(num_votes))
+        if not exists(dirname(self.path)):
+            mkdirp(dirname(self.path))
+        tmp_path = self.path + ".tmp"
+        if exists(tmp_path):
+            remove(tmp_path)
+        db = sqlite3.connect(tmp_path)
+        db.execute("CREATE TABLE titles (title TEXT NOT NULL, year INTEGER, kind TEXT, rating REAL, votes INTEGER)")
+        count = 0
+        rows = []
+        for row in _read_tsv(basics_path):
+            tconst, title_type, primary_title, original_title, start_year = row[:5]
+            try:
+                kind = title_kinds[title_type]
+            except KeyError:
+                continue
+            rating, votes = ratings.get(tconst, (None, 0))
+            year = int(start_year) if start_year else None
+            titles = {normalize_title(primary_title)}
+            if original_title:
+                titles.add(normalize_title(original_title))
+            rows.extend((title, year, kind, rating, votes) for title in titles if title)
+            count += 1
+            if len(rows) >= _batch_size:
+                db.executemany("INSERT INTO titles VALUES (?, ?, ?, ?, ?)", rows)
+                rows = []
+        db.executemany("INSERT INTO titles VALUES (?, ?, ?, ?, ?)", rows)
+        db.execute("CREATE INDEX titles_title_year ON titles (title, year)")
+        db.commit()
+        TrigramIndex(row[0] for row in db.execute("SELECT DISTINCT title FROM titles")).save(db)
+        db.execute("VACUUM")
+        db.close()
+        self.close()
+        rename(tmp_path, self.path)
+        return count
+
+
+def get_title_db():
+    """ Fetch the local title database configured with imdb.title_db_path
+
+    :return: Title database
+    :rtype: TitleDB
+    """
+    path = app.config.get_default("imdb", "title_db_path", "~/.tranny/imdb.db")
+    try:
+        return _title_dbs[path]
+    except KeyError:
+        _title_dbs[path] = TitleDB(path)
+        return _title_dbs[path]
@@ -213,3 +213,166 @@ class Torrent(BDict):
     @property
     def name(self):
         return self['info']['name']
+
+
+class TorrentStream(object):
+    """
+    Validates bencoded torrent data incrementally as it is downloaded so a bad payload,
+    such as a html error page, is rejected on the first bytes rather than after the whole
+    response has been read. The info hash is calculated from the raw bytes of the info
+    value as they arrive.
+    """
+    def __init__(self, max_size=0):
+        """
+        :param max_size: Maximum number of bytes accepted, 0 for no limit
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self.size = 0
+        self.complete = False
+        self._chunks = []
+        # Open containers, 'l' or 'd', and whether the next dict item is a key
+        self._stack = []
+        self._expect_key = False
+        # Current token being read, None between tokens, 'int', 'len' or 'str'
+        self._state = None
+        self._digits = b''
+        self._remaining = 0
+        self._is_key = False
+        self._key = b''
+        self._info_next = False
+        self._hash = sha1()
+        self._hash_depth = None
+        self._hash_start = 0
+        self._has_info = False
+
+    def _fail(self, msg):
+        raise exceptions.InvalidTorrent("Invalid torrent data: {0}".format(msg))
+
+    def _value_start(self, pos):
+        if self._info_next:
+            self._info_next = False
+            self._hash_depth = len(self._stack)
+            self._hash_start = pos
+
+    def _value_done(self, chunk, pos):
+        """ Called after the last byte, at pos, of a value has been read """
+        if self._hash_depth is not None and len(self._stack) == self._hash_depth:
+            self._hash.update(chunk[self._hash_start:pos + 1])
+            self._hash_depth = None
+            self._has_info = True
+        if not self._stack:
+            self.complete = True
+        else:
+            # Values in a dict are always followed by a key
+            self._expect_key = self._stack[-1] == b'd'
+
+    def feed(self, chunk):
+        """ Validate the next chunk of data
+
+        :param chunk: Data received
+        :type chunk: str
+        :raises: InvalidTorrent
+        """
+        if self.max_size and self.size + len(chunk) > self.max_size:
+            self._fail("exceeds maximum size of {0} bytes".format(self.max_size))
+        self._chunks.append(chunk)
+        pos = 0
+        end = len(chunk)
+        while pos < end:
+            if self._state == 'str':
+                take = min(self._remaining, end - pos)
+                if self._is_key:
+                    self._key += chunk[pos:pos + take]
+                self._remaining -= take
+                pos += take
+                if not self._remaining:
+                    self._state = None
+                    self._string_done(chunk, pos - 1)
+                continue
+            char = chunk[pos:pos + 1]
+            if self._state == 'int':
+                if char == b'e':
+                    if self._digits in (b'', b'-') or self._digits.startswith(b'-0') or \
+                            (self._digits.startswith(b'0') and len(self._digits) > 1):
+                        self._fail("malformed integer")
+                    self._state = None
+                    self._value_done(chunk, pos)
+                elif char.isdigit() or (char == b'-' and not self._digits):
+                    self._digits += char
+                else:
+                    self._fail("malformed integer")
+            elif self._state == 'len':
+                if char == b':':
+                    self._remaining = int(self._digits)
+                    if self.max_size and self._remaining > self.max_size:
+                        self._fail("string longer than maximum size")
+                    self._state = 'str'
+                    self._key = b''
+                    if not self._remaining:
+                        self._state = None
+                        self._string_done(chunk, pos)
+                elif char.isdigit() and len(self._digits) < 12:
+                    self._digits += char
+                else:
+                    self._fail("malformed string length")
+            else:
+                self._token(char, chunk, pos)
+            pos += 1
+        if self._hash_depth is not None:
+            self._hash.update(chunk[self._hash_start:])
+            self._hash_start = 0
+        self.size += end
+
+    def _string_done(self, chunk, pos):
+        if self._is_key:
+            self._is_key = False
+            self._expect_key = False
+            if len(self._stack) == 1 and self._key == b'info':
+                self._info_next = True
+        else:
+            self._value_done(chunk, pos)
+
+    def _token(self, char, chunk, pos):
+        if self.complete:
+            self._fail("trailing data")
+        if not self._stack and char != b'd':
+            self._fail("torrent data must be a dictionary")
+        if char == b'e':
+            if not self._stack or (self._stack[-1] == b'd' and not self._expect_key):
+                self._fail("unexpected end")
+            self._stack.pop()
+            self._value_done(chunk, pos)
+            return
+        if self._expect_key:
+            if not char.isdigit():
+                self._fail("dictionary keys must be strings")
+            self._is_key = True
+        else:
+            if self._info_next and char != b'd':
+                self._fail("info must be a dictionary")
+            self._value_start(pos)
+        if char.isdigit():
+            self._state = 'len'
+            self._digits = char
+        elif char == b'i':
+            self._state = 'int'
+            self._digits = b''
+        elif char in (b'l', b'd'):
+            self._stack.append(char)
+            self._expect_key = char == b'd'
+        else:
+            self._fail("unexpected byte")
+
+    def finish(self):
+        """ Check the torrent data received is complete
+
+        :return: Torrent data and hex info hash
+        :rtype: (str, str)
+        :raises: InvalidTorrent
+        """
+        if not self.complete:
+            self._fail("truncated")
+        if not self._has_info:
+            self._fail("missing info dictionary")
+        return b''.join(self._chunks), self._hash.hexdigest()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Trigram inverted index used to narrow down the candidates for fuzzy title matching so
+the comparatively slow fuzzy ratio only has to be computed for a handful of titles.
+Indexes over large title sets are built once and stored, see StoredTrigramIndex.
+"""
+from __future__ import unicode_literals
+import sqlite3
+from array import array
+from collections import Counter, defaultdict
+from heapq import nlargest
+from operator import itemgetter
+import fuzzywuzzy.fuzz
+
+
+def trigrams(text):
+    """ Split text into its set of character trigrams. The text is padded so the start
+    and end of the text form their own trigrams.
+
+    :param text: Normalized text
+    :type text: unicode
+    :return: Set of trigrams
+    :rtype: set
+    """
+    text = "  {0} ".format(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _to_bytes(values):
+    return values.tobytes() if hasattr(values, "tobytes") else values.tostring()
+
+
+def _from_bytes(data):
+    values = array(str("i"))
+    if hasattr(values, "frombytes"):
+        values.frombytes(bytes(data))
+    else:
+        values.fromstring(bytes(data))
+    return values
+
+
+class TrigramIndex(object):
+    """
+    Maps each trigram to the ids of the titles containing it. Candidates for a query are
+    ranked by the dice coefficient of the trigrams they share with it, which only
+    touches the postings of the trigrams in the query rather than every indexed title.
+    """
+    # Maximum number of title ids counted for a query, see candidates
+    max_postings = 10000
+
+    def __init__(self, titles=None):
+        """
+        :param titles: Normalized titles to index
+        :type titles: unicode[]
+        """
+        self.titles = []
+        self._sizes = array(str("i"))
+        self._postings = defaultdict(lambda: array(str("i")))
+        for title in titles or []:
+            self.add(title)
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def add(self, title):
+        """ Add a normalized title to the index
+
+        :param title: Title to add
+        :type title: unicode
+        """
+        title_id = len(self.titles)
+        grams = trigrams(title)
+        self.titles.append(title)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings[gram].append(title_id)
+
+    def _gram_counts(self, grams):
+        """ Number of titles containing each of the trigrams which are indexed
+
+        :rtype: dict
+        """
+        return {gram: len(self._postings[gram]) for gram in grams if gram in self._postings}
+
+    def _gram_postings(self, grams):
+        """ Title ids of each trigram
+
+        :rtype: array[]
+        """
+        return [self._postings[gram] for gram in grams]
+
+    def _titles_by_id(self, title_ids):
+        """ Titles of the ids provided
+
+        :rtype: dict
+        """
+        return {title_id: self.titles[title_id] for title_id in title_ids}
+
+    def candidates(self, query, limit=50):
+        """ Find the titles sharing the most trigrams with the query. The rarest trigrams
+        of the query are counted first, as they narrow down the candidates the most, and
+        once at least two are counted the rest are only counted while the number of title
+        ids counted stays under max_postings. This bounds the work done for a query no
+        matter how many titles are indexed.
+
+        :param query: Normalized title to search for
+        :type query: unicode
+        :param limit: Maximum number of candidates to return
+        :type limit: int
+        :return: (similarity, title) pairs, most similar first
+        :rtype: list
+        """
+        grams = trigrams(query)
+        counted = []
+        total = 0
+        for gram, count in sorted(self._gram_counts(grams).items(), key=itemgetter(1)):
+            if len(counted) >= 2 and total + count > self.max_postings:
+                break
+            counted.append(gram)
+            total += count
+        shared = Counter()
+        for title_ids in self._gram_postings(counted):
+            shared.update(title_ids)
+        size = len(grams)
+        ranked = nlargest(limit, shared.items(), key=lambda item: item[1] * 2.0 / (size + self._sizes[item[0]]))
+        titles = self._titles_by_id([title_id for title_id, count in ranked])
+        return [(count * 2.0 / (size + self._sizes[title_id]), titles[title_id]) for title_id, count in ranked]
+
+    def search(self, query, limit=1, candidates=50, min_ratio=0):
+        """ Fuzzy match the query against the indexed titles. Only the best candidates
+        from the trigram index are scored with the fuzzy ratio.
+
+        :param query: Normalized title to search for
+        :type query: unicode
+        :param limit: Maximum number of matches to return
+        :type limit: int
+        :param candidates: Number of candidates to score
+        :type candidates: int
+        :param min_ratio: Minimum fuzzy ratio, 0-100, a match must have
+        :type min_ratio: int
+        :return: (ratio, title) pairs, best match first
+        :rtype: list
+        """
+        scored = []
+        for similarity, title in self.candidates(query, candidates):
+            ratio = fuzzywuzzy.fuzz.ratio(query, title)
+            if ratio >= min_ratio:
+                scored.append((ratio, title))
+        return nlargest(limit, scored)
+
+    def save(self, db):
+        """ Store the index in a SQLite database so it can be used with StoredTrigramIndex
+        without building it again. Any index already stored is replaced.
+
+        :param db: Database connection
+        :type db: sqlite3.Connection
+        """
+        db.execute("DROP TABLE IF EXISTS trigram_titles")
+        db.execute("DROP TABLE IF EXISTS trigram_postings")
+        db.execute("DROP TABLE IF EXISTS trigram_sizes")
+        db.execute("CREATE TABLE trigram_titles (title_id INTEGER PRIMARY KEY, title TEXT NOT NULL)")
+        db.execute("CREATE TABLE trigram_postings (gram TEXT PRIMARY KEY, count INTEGER, title_ids BLOB)")
+        db.execute("CREATE TABLE trigram_sizes (sizes BLOB)")
+        db.executemany("INSERT INTO trigram_titles VALUES (?, ?)", enumerate(self.titles))
+        db.executemany("INSERT INTO trigram_postings VALUES (?, ?, ?)", (
+            (gram, len(title_ids), sqlite3.Binary(_to_bytes(title_ids))) for gram, title_ids in self._postings.items()))
+        db.execute("INSERT INTO trigram_sizes VALUES (?)", (sqlite3.Binary(_to_bytes(self._sizes)),))
+        db.commit()
+
+
+class StoredTrigramIndex(TrigramIndex):
+    """
+    Trigram index stored in a SQLite database by TrigramIndex.save. Only the trigram count
+    of each title is held in memory, the postings of the trigrams in a query and the
+    titles of the best candidates are read from the database as they are needed.
+    """
+    def __init__(self, db):
+        """
+        :param db: Database connection
+        :type db: sqlite3.Connection
+        """
+        super(StoredTrigramIndex, self).__init__()
+        self._db = db
+        row = db.execute("SELECT sizes FROM trigram_sizes").fetchone()
+        self._sizes = _from_bytes(row[0]) if row else array(str("i"))
+
+    @staticmethod
+    def exists(db):
+        """ Check if a index has been stored in the database
+
+        :param db: Database connection
+        :type db: sqlite3.Connection
+        :rtype: bool
+        """
+        return db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trigram_sizes'").fetchone() \
+            is not None
+
+    def add(self, title):
+        raise NotImplementedError("Stored indexes are read only")
+
+    def _select(self, query, values):
+        # Stay under the SQLite host parameter limit
+        values = list(values)
+        for i in range(0, len(values), 500):
+            chunk = values[i:i + 500]
+            for row in self._db.execute(query.format(", ".join("?" * len(chunk))), chunk):
+                yield row
+
+    def _gram_counts(self, grams):
+        return dict(self._select("SELECT gram, count FROM trigram_postings WHERE gram IN ({0})", grams))
+
+    def _gram_postings(self, grams):
+        return [_from_bytes(row[0]) for row in
+                self._select("SELECT title_ids FROM trigram_postings WHERE gram IN ({0})", grams)]
+
+    def _titles_by_id(self, title_ids):
+        return dict(self._select("SELECT title_id, title FROM trigram_titles WHERE title_id IN ({0})", title_ids))
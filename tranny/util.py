@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 from urlparse import urlparse, urljoin
+from collections import OrderedDict
 from time import time
 from os import getpid
 from psutil import Process, disk_partitions, disk_usage
@@ -75,3 +76,74 @@ def redirect_back(endpoint, **values):
 
 
 contains = lambda seq, values: all([k in values for k in seq])
+
+
+class LRUCache(object):
+    """
+    Size bounded least recently used cache with an optional time to live for each
+    entry. Hit and miss counts are tracked so cache effectiveness can be reported.
+    """
+    def __init__(self, max_size=1024, ttl=0):
+        """
+        :param max_size: Maximum number of entries held before evicting the oldest
+        :type max_size: int
+        :param ttl: Default number of seconds an entry is valid for, 0 for no expiry
+        :type ttl: int
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """ Fetch a value from the cache, marking it as recently used
+
+        :param key: Cache key
+        :param default: Value returned when the key is not cached or expired
+        :return: Cached value
+        """
+        try:
+            expires, value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        if expires and expires < time():
+            self.misses += 1
+            return default
+        self._data[key] = (expires, value)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        """ Store a value in the cache, evicting the least recently used entries if
+        the cache is full
+
+        :param key: Cache key
+        :param value: Value to store
+        :param ttl: Seconds the value is valid for, defaults to the cache ttl
+        :type ttl: int
+        """
+        if ttl is None:
+            ttl = self.ttl
+        self._data.pop(key, None)
+        self._data[key] = (time() + ttl if ttl else 0, value)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        """ Fetch the current cache usage counters
+
+        :return: dict of hits, misses and size
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}